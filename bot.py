@@ -6,12 +6,15 @@ import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from sqlalchemy import text
 
-from config import BOT_TOKEN
+from config import BOT_MODE, BOT_TOKEN, BOT_WORKERS, FSM_STORAGE, WEBHOOK_URL
 # --- ЗМІНА: Імпортуємо нову функцію ---
 from database.engine import async_session, create_tables
+from database.orm import orm_rebuild_collected_totals_async
 from handlers import (archive, common, error_handler, user_search)
 from handlers.admin import (archive_handlers as admin_archive,
                             core as admin_core,
@@ -19,7 +22,15 @@ from handlers.admin import (archive_handlers as admin_archive,
                             report_handlers as admin_reports)
 from handlers.user import (item_addition, list_editing, list_management,
                            list_saving)
+from middlewares.callback_answer_middleware import IgnoreExpiredCallbackAnswers
+from middlewares.concurrency_middleware import ConcurrencyMiddleware
+from middlewares.fsm_middleware import FSMUnitOfWorkMiddleware
 from middlewares.logging_middleware import LoggingMiddleware
+from utils.broadcast_queue import run_broadcast_worker
+from utils.fsm_storage import PostgresStorage
+from utils.import_pool import shutdown_import_executor
+from utils.update_workers import run_update_workers
+from utils.webhook_server import run_webhook
 
 
 # --- ЗМІНА: Функція для видалення меню команд ---
@@ -31,10 +42,8 @@ async def set_main_menu(bot: Bot):
     await bot.set_my_commands([])
 
 
-async def main():
-    """
-    Головна асинхронна функція для ініціалізації та запуску бота.
-    """
+def setup_logging():
+    """Налаштовує логування в консоль і файл `bot.log` (окремо в кожному процесі)."""
     log_format = (
         "%(asctime)s - %(levelname)s - "
         "[User:%(user_id)s | Update:%(update_id)s] - "
@@ -48,29 +57,34 @@ async def main():
             logging.FileHandler('bot.log', mode='a')
         ]
     )
-    logger = logging.getLogger(__name__)
-
-    if not BOT_TOKEN:
-        logger.critical("Критична помилка: BOT_TOKEN не знайдено! Перевірте ваш .env файл.")
-        sys.exit(1)
 
-    try:
-        # --- ЗМІНА: Додаємо виклик створення таблиць ---
-        await create_tables()
-        async with async_session() as session:
-            await session.execute(text('SELECT 1'))
-        logger.info("Підключення до бази даних успішне.")
-    except Exception as e:
-        logger.critical("Помилка підключення до бази даних: %s", e, exc_info=True)
-        sys.exit(1)
 
+def create_bot() -> Bot:
+    """Створює екземпляр бота з налаштуваннями за замовчуванням."""
     bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(
         parse_mode="Markdown",
         link_preview_is_disabled=True
     ))
-    dp = Dispatcher()
+    bot.session.middleware(IgnoreExpiredCallbackAnswers())
+    return bot
+
+
+def create_storage() -> BaseStorage:
+    """Стан FSM у БД переживає перезапуск і спільний для процесів; у пам'яті — лише для локальної розробки."""
+    return PostgresStorage() if FSM_STORAGE == "postgres" else MemoryStorage()
+
+
+def build_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Створює диспетчер з усіма middleware та роутерами бота."""
+    dp = Dispatcher(storage=storage)
 
     dp.update.middleware(LoggingMiddleware())
+    # Читання й записи стану FSM за одне оновлення об'єднуються в один прохід до сховища
+    dp.update.middleware(FSMUnitOfWorkMiddleware())
+    # Один обмежувач на обидва типи подій: ліміти спільні для повідомлень і кнопок
+    concurrency = ConcurrencyMiddleware()
+    dp.message.middleware(concurrency)
+    dp.callback_query.middleware(concurrency)
 
     # --- Реєстрація роутерів ---
     dp.include_router(error_handler.router)
@@ -85,19 +99,68 @@ async def main():
     dp.include_router(list_editing.router)
     dp.include_router(list_saving.router)
     dp.include_router(user_search.router)
+    return dp
+
+
+async def main():
+    """
+    Головна асинхронна функція для ініціалізації та запуску бота.
+    """
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    if not BOT_TOKEN:
+        logger.critical("Критична помилка: BOT_TOKEN не знайдено! Перевірте ваш .env файл.")
+        sys.exit(1)
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        logger.critical("Критична помилка: BOT_MODE=webhook, але WEBHOOK_URL не задано.")
+        sys.exit(1)
+    if BOT_WORKERS > 1 and FSM_STORAGE != "postgres":
+        logger.critical("Критична помилка: BOT_WORKERS > 1 потребує спільного стану FSM_STORAGE=postgres.")
+        sys.exit(1)
 
     try:
-        await set_main_menu(bot)
-        await bot.delete_webhook(drop_pending_updates=True)
+        # --- ЗМІНА: Додаємо виклик створення таблиць ---
+        await create_tables()
+        if rebuilt := await orm_rebuild_collected_totals_async():
+            logger.info("Зведення зібраного заповнено з архіву: %s артикулів.", rebuilt)
+        async with async_session() as session:
+            await session.execute(text('SELECT 1'))
+        logger.info("Підключення до бази даних успішне.")
+    except Exception as e:
+        logger.critical("Помилка підключення до бази даних: %s", e, exc_info=True)
+        sys.exit(1)
+
+    bot = create_bot()
+    storage = create_storage()
+    dp = build_dispatcher(storage)
 
-        logger.info("Бот запускається...")
-        await dp.start_polling(bot)
+    broadcast_worker = None
+    try:
+        await set_main_menu(bot)
+        # Фоновий обробник черги розсилок; після перезапуску продовжує незавершені розсилки
+        broadcast_worker = asyncio.create_task(run_broadcast_worker(bot))
+
+        if BOT_WORKERS > 1:
+            logger.info("Бот запускається з %s процесами-обробниками (%s)...", BOT_WORKERS, BOT_MODE)
+            await run_update_workers(bot, dp.resolve_used_update_types())
+        elif BOT_MODE == "webhook":
+            logger.info("Бот запускається в режимі webhook...")
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Бот запускається...")
+            await dp.start_polling(bot)
 
     except Exception as e:
         logger.critical("Критична помилка під час роботи бота: %s", e, exc_info=True)
     finally:
         logger.info("Завершення роботи бота...")
+        if broadcast_worker is not None:
+            broadcast_worker.cancel()
+        await storage.close()
         await bot.session.close()
+        shutdown_import_executor()
         logger.info("Сесія бота закрита.")
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 import logging
 import os
+import secrets
 from typing import List
 
 from dotenv import load_dotenv
@@ -62,4 +63,55 @@ DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{D
 # --- ВИДАЛЕНО: SYNC_DATABASE_URL ---
 
 # --- Конфігурація Сховища ---
-ARCHIVES_PATH = "archives"
\ No newline at end of file
+ARCHIVES_PATH = "archives"
+
+def get_positive_int_env(var_name: str, default: int) -> int:
+    """Отримує додатне ціле значення змінної оточення або значення за замовчуванням."""
+    try:
+        return max(1, int(os.getenv(var_name, default)))
+    except ValueError:
+        logger.warning("Некоректне значення %s, використовується %s.", var_name, default)
+        return default
+
+# --- Конфігурація Імпорту ---
+# Кількість процесів для розбору файлів імпорту (за замовчуванням — кількість ядер)
+IMPORT_WORKERS = get_positive_int_env("IMPORT_WORKERS", os.cpu_count() or 1)
+
+# --- Конфігурація Розсилок ---
+# Глобальний ліміт Telegram — близько 30 повідомлень на секунду, лишаємо запас
+BROADCAST_RATE = get_positive_int_env("BROADCAST_RATE", 25)
+BROADCAST_CONCURRENCY = get_positive_int_env("BROADCAST_CONCURRENCY", 10)
+
+# --- Конфігурація FSM ---
+# "memory" — стан у пам'яті процесу (втрачається при перезапуску), "postgres" — у базі даних
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory").strip().lower()
+# Скільки ключів FSM тримати в кеші процесу
+FSM_CACHE_SIZE = get_positive_int_env("FSM_CACHE_SIZE", 10000)
+
+# --- Режим отримання оновлень ---
+# "polling" — бот сам опитує Telegram, "webhook" — Telegram надсилає оновлення на WEBHOOK_URL
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Публічна HTTPS-адреса, за якою Telegram бачить бота (зазвичай — reverse proxy)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Секрет, який Telegram повертає в заголовку X-Telegram-Bot-Api-Secret-Token; якщо не задано — генерується при старті
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+# Адреса, яку слухає локальний aiohttp-сервер
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = get_positive_int_env("WEBHOOK_PORT", 8080)
+
+# Кількість процесів, що обробляють оновлення; оновлення одного користувача завжди
+# потрапляють в один процес. Більше 1 — лише з FSM_STORAGE=postgres
+BOT_WORKERS = get_positive_int_env("BOT_WORKERS", 1)
+
+# --- Обмеження одночасної обробки (у межах одного процесу) ---
+# Звичайні дії: пошук, кнопки, редагування списку
+INTERACTIVE_CONCURRENCY = get_positive_int_env("INTERACTIVE_CONCURRENCY", 32)
+# Важкі дії: збереження списків, імпорт, звіти, архіви
+HEAVY_CONCURRENCY = get_positive_int_env("HEAVY_CONCURRENCY", 2)
+# Скільки важких дій може чекати в черзі; решта отримує прохання спробувати пізніше
+HEAVY_QUEUE_LIMIT = get_positive_int_env("HEAVY_QUEUE_LIMIT", 20)
+
+# --- Конфігурація Примусового Збереження ---
+# Скільки списків зберігається одночасно (кожне збереження тримає з'єднання з БД)
+FORCE_SAVE_CONCURRENCY = get_positive_int_env("FORCE_SAVE_CONCURRENCY", 4)
\ No newline at end of file
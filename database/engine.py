@@ -1,6 +1,6 @@
 import logging
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -11,6 +11,13 @@ from database.models import Base
 # Налаштування логера для цього модуля
 logger = logging.getLogger(__name__)
 
+# Ідемпотентні зміни схеми для вже існуючих таблиць (create_all не додає нові колонки)
+SCHEMA_PATCHES = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS хеш_даних VARCHAR(32)",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_blocked BOOLEAN NOT NULL DEFAULT false",
+    "ALTER TABLE import_staging_rows ADD COLUMN IF NOT EXISTS хеш_даних VARCHAR(32)",
+]
+
 # --- НОВА ФУНКЦІЯ: Для ініціалізації таблиць ---
 async def create_tables():
     """
@@ -19,6 +26,8 @@ async def create_tables():
     logger.info("Починаю створення таблиць в БД...")
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for patch in SCHEMA_PATCHES:
+            await conn.execute(text(patch))
     logger.info("Створення таблиць завершено.")
 
 try:
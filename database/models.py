@@ -2,8 +2,9 @@
 
 from typing import List
 
-from sqlalchemy import (BigInteger, Boolean, DateTime, Float, ForeignKey, Integer,
-                        String, func)
+from sqlalchemy import (BigInteger, Boolean, DateTime, Float, ForeignKey, Index,
+                        Integer, Sequence, String, Text, false, func)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -12,6 +13,12 @@ class Base(DeclarativeBase):
     pass
 
 
+# Лічильники версій даних: каталогу (імпорт, віднімання) та резервів (кошики, збереження).
+# Використовуються як ключ кешу звітів; послідовності не блокують рядків при інкременті.
+catalogue_version_seq = Sequence('catalogue_version_seq', metadata=Base.metadata)
+reservation_version_seq = Sequence('reservation_version_seq', metadata=Base.metadata)
+
+
 class User(Base):
     """Модель, що представляє користувача бота."""
     __tablename__ = 'users'
@@ -20,6 +27,8 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(100), nullable=True)
     first_name: Mapped[str] = mapped_column(String(100))
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    # Користувач заблокував бота: розсилки його пропускають, доки він знову не напише боту
+    is_blocked: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false())
 
     saved_lists: Mapped[List["SavedList"]] = relationship(back_populates="user")
     temp_list_items: Mapped[List["TempList"]] = relationship(back_populates="user")
@@ -45,6 +54,38 @@ class Product(Base):
     ціна: Mapped[float] = mapped_column(Float, nullable=True, default=0.0)
     # Статус активності товару
     активний: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
+    # Хеш імпортованих полів: дозволяє не переписувати незмінені товари.
+    # Будь-який інший запис у ці поля має скидати хеш у NULL
+    хеш_даних: Mapped[str] = mapped_column(String(32), nullable=True)
+
+
+class ImportStagingRow(Base):
+    """
+    Модель розібраного рядка файлу імпорту, що чекає на застосування.
+
+    Рядки одного завантаження мають спільний `batch_id`; таблиця UNLOGGED,
+    бо це проміжні дані, які не потрібно відновлювати після збою.
+    """
+    __tablename__ = 'import_staging_rows'
+    __table_args__ = (
+        Index('ix_import_staging_batch_article', 'batch_id', 'артикул', 'рядок'),
+        {'prefixes': ['UNLOGGED']},
+    )
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    batch_id: Mapped[str] = mapped_column(String(32))
+    рядок: Mapped[int] = mapped_column(BigInteger)
+    артикул: Mapped[str] = mapped_column(String(20))
+    назва: Mapped[str] = mapped_column(String(255))
+    відділ: Mapped[int] = mapped_column(BigInteger)
+    група: Mapped[str] = mapped_column(String(100))
+    кількість: Mapped[str] = mapped_column(String(50))
+    місяці_без_руху: Mapped[int] = mapped_column(Integer, nullable=True)
+    сума_залишку: Mapped[float] = mapped_column(Float)
+    ціна: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
+    # Хеш імпортованих полів рядка, порівнюється з `Product.хеш_даних` під час застосування
+    хеш_даних: Mapped[str] = mapped_column(String(32), nullable=True)
 
 
 class SavedList(Base):
@@ -71,6 +112,33 @@ class SavedListItem(Base):
     saved_list: Mapped["SavedList"] = relationship(back_populates="items")
 
 
+class ImportLog(Base):
+    """Модель запису про успішний імпорт: дозволяє пропускати повторне завантаження того самого файлу."""
+    __tablename__ = 'import_log'
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    file_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    rows_hash: Mapped[str] = mapped_column(String(32))
+    # Версія каталогу одразу після імпорту: якщо вона змінилась, той самий файл знову щось змінить
+    catalogue_version: Mapped[int] = mapped_column(BigInteger)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+
+
+class ReportCacheEntry(Base):
+    """Модель кешу звітів: file_id останнього надісланого звіту та версії даних, з яких його зібрано."""
+    __tablename__ = 'report_cache'
+    kind: Mapped[str] = mapped_column(String(50), primary_key=True)
+    catalogue_version: Mapped[int] = mapped_column(BigInteger)
+    reservation_version: Mapped[int] = mapped_column(BigInteger)
+    file_id: Mapped[str] = mapped_column(String(255))
+
+
+class CollectedTotal(Base):
+    """Модель, що зберігає накопичену кількість зібраного товару за артикулом (зведення)."""
+    __tablename__ = 'collected_totals'
+    article: Mapped[str] = mapped_column(String(20), primary_key=True)
+    quantity: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
 class TempList(Base):
     """Модель, що представляє тимчасовий (поточний) список товарів користувача."""
     __tablename__ = 'temp_lists'
@@ -80,4 +148,46 @@ class TempList(Base):
     quantity: Mapped[int] = mapped_column(Integer)
 
     product: Mapped["Product"] = relationship()
-    user: Mapped["User"] = relationship(back_populates="temp_list_items")
\ No newline at end of file
+    user: Mapped["User"] = relationship(back_populates="temp_list_items")
+
+class BroadcastJob(Base):
+    """Модель розсилки: група повідомлень, що надсилаються фоновим обробником черги."""
+    __tablename__ = 'broadcast_jobs'
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now())
+    finished_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+    # Повідомлення адміністратора, у якому показується прогрес розсилки
+    progress_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    progress_message_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
+    recipients: Mapped[List["BroadcastRecipient"]] = relationship(back_populates="job", cascade="all, delete-orphan")
+
+
+class BroadcastRecipient(Base):
+    """
+    Модель одного повідомлення розсилки.
+
+    Статуси: pending -> sending -> sent / failed / blocked. Рядок позначається як
+    sending ще до надсилання, тож після перезапуску повідомлення не надсилається вдруге.
+    """
+    __tablename__ = 'broadcast_recipients'
+    __table_args__ = (Index('ix_broadcast_recipients_status', 'status', 'id'),)
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey('broadcast_jobs.id'), index=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    # Клавіатура у вигляді JSON (InlineKeyboardMarkup)
+    reply_markup: Mapped[str] = mapped_column(Text, nullable=True)
+    status: Mapped[str] = mapped_column(String(10), default='pending')
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+    job: Mapped["BroadcastJob"] = relationship(back_populates="recipients")
+
+
+class FSMRecord(Base):
+    """Модель запису FSM-сховища: стан і дані одного ключа aiogram (бот, чат, користувач...)."""
+    __tablename__ = 'fsm_records'
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, default=dict)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
@@ -6,8 +6,10 @@
 
 # --- ЗМІНА: Оновлюємо список імпортів ---
 from .products import (
-    orm_find_products, orm_get_all_products_async, orm_get_product_by_id,
-    orm_smart_import, orm_subtract_collected
+    orm_apply_staged_import, orm_discard_staged_import, orm_find_products,
+    orm_get_all_products_async, orm_get_product_by_id,
+    orm_is_import_unchanged, orm_lock_products, orm_preview_staged_import, orm_smart_import, orm_stage_import,
+    orm_stream_stock_report_rows, orm_subtract_collected
 )
 from .temp_lists import (
     orm_add_item_to_temp_list, orm_clear_temp_list, orm_delete_temp_list_item,
@@ -21,10 +23,19 @@ from .archives import (
     orm_delete_lists_older_than_async, orm_get_all_collected_items_async,
     orm_get_all_files_for_user, orm_get_user_lists_archive,
     orm_get_users_for_warning_async, orm_get_users_with_archives,
-    orm_update_reserved_quantity
+    orm_rebuild_collected_totals_async, orm_update_reserved_quantity
 )
 from .users import (
-    orm_upsert_user, orm_get_all_users_async
+    orm_upsert_user, orm_get_all_users_async, orm_mark_users_blocked
+)
+from .broadcasts import (
+    orm_claim_broadcast_recipients, orm_create_broadcast_job,
+    orm_fail_interrupted_broadcasts, orm_get_broadcast_progress,
+    orm_set_broadcast_statuses
+)
+from .versions import (
+    orm_bump_catalogue_version, orm_bump_reservation_version,
+    orm_get_cached_report, orm_get_data_versions, orm_store_cached_report
 )
 
 # Явно визначаємо, що саме буде експортуватися
@@ -32,6 +43,9 @@ __all__ = [
     # products
     "orm_find_products", "orm_get_product_by_id", "orm_smart_import",
     "orm_subtract_collected", "orm_get_all_products_async",
+    "orm_stream_stock_report_rows", "orm_stage_import",
+    "orm_preview_staged_import", "orm_apply_staged_import",
+    "orm_discard_staged_import", "orm_is_import_unchanged", "orm_lock_products",
     # temp_lists
     "orm_clear_temp_list", "orm_add_item_to_temp_list",
     "orm_delete_temp_list_item", "orm_get_temp_list",
@@ -44,7 +58,14 @@ __all__ = [
     "orm_get_user_lists_archive", "orm_get_all_files_for_user",
     "orm_get_users_with_archives", "orm_get_all_collected_items_async",
     "orm_delete_all_saved_lists_async", "orm_delete_lists_older_than_async",
-    "orm_get_users_for_warning_async",
+    "orm_get_users_for_warning_async", "orm_rebuild_collected_totals_async",
     # users
-    "orm_upsert_user", "orm_get_all_users_async",
+    "orm_upsert_user", "orm_get_all_users_async", "orm_mark_users_blocked",
+    # broadcasts
+    "orm_create_broadcast_job", "orm_claim_broadcast_recipients",
+    "orm_set_broadcast_statuses", "orm_get_broadcast_progress",
+    "orm_fail_interrupted_broadcasts",
+    # versions
+    "orm_bump_catalogue_version", "orm_bump_reservation_version",
+    "orm_get_data_versions", "orm_get_cached_report", "orm_store_cached_report",
 ]
\ No newline at end of file
@@ -5,18 +5,43 @@ import os
 import shutil
 from datetime import datetime, timedelta
 
-from sqlalchemy import delete, func, select
+from sqlalchemy import delete, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
 
 from config import ARCHIVES_PATH
 # --- ЗМІНА: Видаляємо імпорт sync_session ---
 from database.engine import async_session
-from database.models import (Product, SavedList, SavedListItem)
+from database.models import (CollectedTotal, Product, SavedList, SavedListItem)
 from database.orm.products import _extract_article
+from database.orm.versions import orm_bump_reservation_version
 
 logger = logging.getLogger(__name__)
 
 
+def _saved_item_article_expr():
+    """SQL-аналог `_extract_article`: артикул з початку назви збереженої позиції."""
+    # Шаблон вбудовано літералом, щоб вираз у SELECT і GROUP BY збігався для PostgreSQL
+    return func.substring(func.trim(SavedListItem.article_name), literal_column("'^([0-9]{8,})'"))
+
+
+async def _decrement_collected_totals(session, list_ids: list[int]):
+    """Віднімає позиції списків, що видаляються, від зведення зібраного."""
+    article = _saved_item_article_expr()
+    removed = (
+        select(article.label("article"), func.sum(SavedListItem.quantity).label("quantity"))
+        .where(SavedListItem.list_id.in_(list_ids), article.isnot(None))
+        .group_by(article)
+        .subquery()
+    )
+    await session.execute(
+        update(CollectedTotal)
+        .where(CollectedTotal.article == removed.c.article)
+        .values(quantity=CollectedTotal.quantity - removed.c.quantity)
+    )
+    await session.execute(delete(CollectedTotal).where(CollectedTotal.quantity <= 0))
+
+
 # --- Асинхронні функції для роботи з архівами ---
 
 async def orm_add_saved_list(session, user_id: int, file_name: str, file_path: str, items: list[dict]):
@@ -29,6 +54,22 @@ async def orm_add_saved_list(session, user_id: int, file_name: str, file_path: s
         list_item = SavedListItem(list_id=new_list.id, article_name=item["article_name"], quantity=item["quantity"])
         session.add(list_item)
 
+    # Оновлюємо зведення зібраного в тій самій транзакції
+    totals = {}
+    for item in items:
+        if article := _extract_article(item["article_name"]):
+            totals[article] = totals.get(article, 0) + item["quantity"]
+    if totals:
+        # Сортування за артикулом задає однаковий порядок блокувань для паралельних збережень
+        stmt = insert(CollectedTotal).values([
+            {"article": article, "quantity": quantity} for article, quantity in sorted(totals.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['article'],
+            set_={'quantity': CollectedTotal.quantity + stmt.excluded.quantity}
+        )
+        await session.execute(stmt)
+
 
 async def orm_update_reserved_quantity(session, items: list[dict]):
     """Оновлює кількість зарезервованих товарів (`відкладено`)."""
@@ -66,31 +107,39 @@ async def orm_get_users_with_archives() -> list[tuple[int, int]]:
 # --- ЗМІНА: Усі синхронні функції перероблено на асинхронні ---
 
 async def orm_get_all_collected_items_async() -> list[dict]:
-    """Асинхронно збирає зведені дані про всі товари у всіх збережених списках."""
+    """Асинхронно отримує зведені дані про зібрані товари з таблиці-зведення."""
     async with async_session() as session:
-        products_result = await session.execute(select(Product))
-        all_products = {p.артикул: p for p in products_result.scalars()}
-        
-        saved_items_result = await session.execute(select(SavedListItem))
-        all_saved_items = saved_items_result.scalars().all()
+        query = (
+            select(Product.відділ, Product.група, Product.назва, CollectedTotal.quantity)
+            .join(CollectedTotal, CollectedTotal.article == Product.артикул)
+            .where(CollectedTotal.quantity > 0)
+            .order_by(Product.відділ, Product.назва)
+        )
+        result = await session.execute(query)
+        return [
+            {"department": department, "group": group, "name": name, "quantity": quantity}
+            for department, group, name, quantity in result
+        ]
 
-        collected_data = {}
-        for item in all_saved_items:
-            article = _extract_article(item.article_name)
-            if not article or article not in all_products:
-                continue
 
-            product_info = all_products[article]
-            
-            if article in collected_data:
-                collected_data[article]["quantity"] += item.quantity
-            else:
-                collected_data[article] = {
-                    "department": product_info.відділ, "group": product_info.група,
-                    "name": product_info.назва, "quantity": item.quantity,
-                }
-        
-        return list(collected_data.values())
+async def orm_rebuild_collected_totals_async() -> int:
+    """
+    Заповнює зведення зібраного з історії збережених списків, якщо воно порожнє.
+    Потрібно один раз після появи таблиці на базі з уже накопиченими списками.
+    """
+    async with async_session() as session:
+        if await session.scalar(select(func.count()).select_from(CollectedTotal)):
+            return 0
+
+        article = _saved_item_article_expr()
+        collected = (
+            select(article.label("article"), func.sum(SavedListItem.quantity).label("quantity"))
+            .where(article.isnot(None))
+            .group_by(article)
+        )
+        result = await session.execute(insert(CollectedTotal).from_select(["article", "quantity"], collected))
+        await session.commit()
+        return result.rowcount
 
 
 async def orm_delete_all_saved_lists_async() -> int:
@@ -103,7 +152,9 @@ async def orm_delete_all_saved_lists_async() -> int:
         
         await session.execute(delete(SavedListItem))
         await session.execute(delete(SavedList))
+        await session.execute(delete(CollectedTotal))
         await session.commit()
+        await orm_bump_reservation_version()
         
         if os.path.exists(ARCHIVES_PATH):
             shutil.rmtree(ARCHIVES_PATH)
@@ -145,8 +196,10 @@ async def orm_delete_lists_older_than_async(hours: int) -> int:
                 except OSError as e:
                     logger.error(f"Помилка видалення файлу {lst.file_path}: {e}")
 
+        await _decrement_collected_totals(session, list_ids_to_delete)
         await session.execute(delete(SavedListItem).where(SavedListItem.list_id.in_(list_ids_to_delete)))
         await session.execute(delete(SavedList).where(SavedList.id.in_(list_ids_to_delete)))
         await session.commit()
+        await orm_bump_reservation_version()
         
         return count
\ No newline at end of file
@@ -0,0 +1,122 @@
+# epicservice/database/orm/broadcasts.py
+
+import logging
+from typing import Optional
+
+from sqlalchemy import func, insert, select, update
+
+from database.engine import async_session
+from database.models import BroadcastJob, BroadcastRecipient
+
+logger = logging.getLogger(__name__)
+
+
+async def orm_create_broadcast_job(
+    messages: list[tuple[int, str, Optional[str]]],
+    progress_chat_id: Optional[int] = None,
+    progress_message_id: Optional[int] = None,
+) -> int:
+    """
+    Зберігає розсилку та її повідомлення (user_id, текст, клавіатура в JSON) для фонового надсилання.
+    Повертає id розсилки.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            job = BroadcastJob(progress_chat_id=progress_chat_id, progress_message_id=progress_message_id)
+            session.add(job)
+            await session.flush()
+            if messages:
+                await session.execute(insert(BroadcastRecipient), [
+                    {"job_id": job.id, "user_id": user_id, "text": text, "reply_markup": reply_markup}
+                    for user_id, text, reply_markup in messages
+                ])
+            return job.id
+
+
+async def orm_claim_broadcast_recipients(limit: int) -> list:
+    """
+    Забирає до `limit` повідомлень, що очікують надсилання, і позначає їх як `sending`.
+
+    FOR UPDATE SKIP LOCKED дозволяє кільком обробникам (процесам) не брати ті самі рядки.
+    """
+    claimable = (
+        select(BroadcastRecipient.id)
+        .where(BroadcastRecipient.status == 'pending')
+        .order_by(BroadcastRecipient.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.id.in_(claimable))
+                .values(status='sending', updated_at=func.now())
+                .returning(
+                    BroadcastRecipient.id, BroadcastRecipient.job_id, BroadcastRecipient.user_id,
+                    BroadcastRecipient.text, BroadcastRecipient.reply_markup
+                )
+                .execution_options(synchronize_session=False)
+            )
+            return sorted(result.all(), key=lambda row: row.id)
+
+
+async def orm_set_broadcast_statuses(statuses: dict[str, list[int]]):
+    """Записує результат надсилання: {статус: [id повідомлень]}."""
+    async with async_session() as session:
+        async with session.begin():
+            for status, recipient_ids in statuses.items():
+                if recipient_ids:
+                    await session.execute(
+                        update(BroadcastRecipient)
+                        .where(BroadcastRecipient.id.in_(recipient_ids))
+                        .values(status=status, updated_at=func.now())
+                    )
+
+
+async def orm_get_broadcast_progress(job_ids: list[int]) -> dict[int, dict]:
+    """
+    Повертає для кожної розсилки кількість повідомлень за статусами та дані повідомлення прогресу.
+    Розсилки, у яких не лишилось повідомлень у черзі, позначаються завершеними.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            jobs = {
+                job.id: {
+                    "chat_id": job.progress_chat_id, "message_id": job.progress_message_id,
+                    "pending": 0, "sending": 0, "sent": 0, "failed": 0, "blocked": 0,
+                }
+                for job in (await session.scalars(select(BroadcastJob).where(BroadcastJob.id.in_(job_ids))))
+            }
+            counts = await session.execute(
+                select(BroadcastRecipient.job_id, BroadcastRecipient.status, func.count())
+                .where(BroadcastRecipient.job_id.in_(job_ids))
+                .group_by(BroadcastRecipient.job_id, BroadcastRecipient.status)
+            )
+            for job_id, status, count in counts:
+                jobs[job_id][status] = count
+
+            finished_ids = [job_id for job_id, job in jobs.items() if not job["pending"] and not job["sending"]]
+            if finished_ids:
+                await session.execute(
+                    update(BroadcastJob)
+                    .where(BroadcastJob.id.in_(finished_ids), BroadcastJob.finished_at.is_(None))
+                    .values(finished_at=func.now())
+                )
+            return jobs
+
+
+async def orm_fail_interrupted_broadcasts() -> int:
+    """
+    Позначає як `failed` повідомлення, надсилання яких перервав перезапуск бота.
+    Невідомо, чи дійшли вони до користувача, тому повторно їх не надсилаємо.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.status == 'sending')
+                .values(status='failed', updated_at=func.now())
+            )
+            return result.rowcount
@@ -3,18 +3,43 @@
 import asyncio
 import logging
 import re
+import uuid
+from collections import deque
+from datetime import timedelta
+from typing import Iterable
 
 import pandas as pd
-from sqlalchemy import delete, func, select, update
+from sqlalchemy import (Float, Numeric, String, case, cast, delete, exists, func,
+                        literal, literal_column, select, text, true, update)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import aliased
 from thefuzz import fuzz
 
 # --- ЗМІНА: Видаляємо імпорт sync_session ---
+from config import IMPORT_WORKERS
 from database.engine import async_session
-from database.models import Product
+from database.models import ImportLog, ImportStagingRow, Product, TempList
+from database.orm.versions import orm_bump_catalogue_version, orm_get_data_versions
+from utils.import_pool import get_import_executor
+from utils.import_parser import (REQUIRED_IMPORT_COLUMNS, ImportReadError,
+                                 ImportValidationError, parse_import_dataframe)
 
 # Налаштовуємо логер для цього модуля
 logger = logging.getLogger(__name__)
 
+# Колонки розібраного файлу, що копіюються в `import_staging_rows`
+IMPORT_STAGING_COLUMNS = (
+    "рядок", "артикул", "назва", "відділ", "група", "кількість", "місяці_без_руху", "сума_залишку", "ціна"
+)
+# Непідтверджені завантаження старші за цей термін видаляються під час наступного імпорту
+STAGED_IMPORT_TTL_HOURS = 24
+# Скільки найбільших змін ціни та залишку показувати на відділ у попередньому перегляді
+PREVIEW_TOP_CHANGES = 3
+# Застосування імпорту не чекає на блокування товарів довше за цей час, а повторює спробу
+IMPORT_LOCK_TIMEOUT_MS = 2000
+IMPORT_SWAP_ATTEMPTS = 5
+
 
 # --- Допоміжні приватні функції ---
 
@@ -26,154 +51,520 @@ def _extract_article(name_str: str) -> str | None:
     return match.group(1) if match else None
 
 
-def _normalize_value(value: any, is_float: bool = True) -> float | str:
-    """Приводить значення до стандартизованого типу."""
-    if pd.isna(value):
-        return 0.0 if is_float else "0"
-    s_value = str(value).replace(',', '.').strip()
-    s_value = re.sub(r'[^0-9.-]', '', s_value)
-    try:
-        return float(s_value) if is_float else s_value
-    except (ValueError, TypeError):
-        return 0.0 if is_float else "0"
+def _normalized_number_text(text_column):
+    """SQL-вираз: текстове число з крапкою замість коми, без пробілів по краях."""
+    return func.replace(func.trim(text_column), ',', '.')
+
+
+def _is_numeric_text(text_column):
+    """SQL-умова: текстове значення є коректним числом."""
+    return _normalized_number_text(text_column).op('~')(r'^[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)$')
+
+
+def _stock_quantity_expr(quantity_column=None):
+    """SQL-вираз, що приводить текстову `кількість` до числа (некоректні значення дають 0)."""
+    quantity_column = Product.кількість if quantity_column is None else quantity_column
+    return case(
+        (_is_numeric_text(quantity_column), cast(_normalized_number_text(quantity_column), Float)),
+        else_=0.0
+    )
 
 
 # --- Функції імпорту та оновлення даних ---
 
-# --- ЗМІНА: Функція перероблена на асинхронну ---
-async def orm_smart_import(dataframe: pd.DataFrame) -> dict:
-    """Асинхронно виконує "розумний" імпорт товарів з DataFrame у базу даних."""
-    try:
-        df_columns_lower = {str(col).lower() for col in dataframe.columns}
-        required_columns = {"в", "г", "н", "к"}
-        
-        if not required_columns.issubset(df_columns_lower):
-            missing = required_columns - df_columns_lower
-            logger.error(f"Помилка імпорту: відсутні колонки: {', '.join(missing)}.")
-            return {}
-
-        column_mapping = {"в": "відділ", "г": "група", "н": "назва", "к": "кількість", "м": "місяці_без_руху", "с": "сума_залишку", "ц": "ціна"}
-        dataframe.rename(columns=lambda c: column_mapping.get(str(c).lower(), c), inplace=True)
-
-        has_months_column = "місяці_без_руху" in dataframe.columns
-        file_articles_data = {}
-        for _, row in dataframe.iterrows():
-            if pd.notna(row["назва"]) and (article := _extract_article(row["назва"])):
-                price = _normalize_value(row.get("ціна", 0.0))
-                if price == 0.0:
-                    quantity_val = _normalize_value(row.get("кількість", 0.0))
-                    stock_sum = _normalize_value(row.get("сума_залишку", 0.0))
-                    if quantity_val > 0:
-                        price = stock_sum / quantity_val
-
-                quantity_str = _normalize_value(row.get("кількість", "0"), is_float=False)
-                final_stock_sum = float(_normalize_value(quantity_str, is_float=True)) * price
-                months_value = int(_normalize_value(row.get("місяці_без_руху", 0))) if has_months_column else None
-
-                file_articles_data[article] = {
-                    "назва": str(row["назва"]).strip(), "відділ": int(row["відділ"]),
-                    "група": str(row.get("група", "")).strip(), "кількість": quantity_str,
-                    "місяці_без_руху": months_value, "сума_залишку": final_stock_sum,
-                    "ціна": price, "активний": True
-                }
-
-        file_articles = set(file_articles_data.keys())
-        updated_count, added_count, deactivated_count, reactivated_count = 0, 0, 0, 0
-        department_stats = {}
+def _staged(batch_id: str):
+    """Умова відбору рядків одного завантаження з `import_staging_rows`."""
+    return ImportStagingRow.batch_id == batch_id
+
+
+def _staging_content_hash():
+    """SQL-вираз хешу імпортованих полів рядка; порівнюється з `Product.хеш_даних`."""
+    staging = ImportStagingRow
+    return func.md5(func.concat_ws(
+        '|', staging.назва, cast(staging.відділ, String), staging.група, staging.кількість,
+        func.coalesce(cast(staging.місяці_без_руху, String), ''),
+        cast(staging.сума_залишку, String), cast(staging.ціна, String)
+    ))
+
+
+async def _copy_to_import_staging(session, batch_id: str, parsed: pd.DataFrame):
+    """Завантажує нормалізовані рядки пачки в `import_staging_rows` через COPY."""
+    columns = ("batch_id",) + IMPORT_STAGING_COLUMNS
+    records = list(zip([batch_id] * len(parsed), *(parsed[column].tolist() for column in IMPORT_STAGING_COLUMNS)))
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        ImportStagingRow.__tablename__, records=records, columns=columns
+    )
+
+
+async def _finalize_import_staging(session, batch_id: str):
+    """Залишає в завантаженні один (останній у файлі) рядок на артикул."""
+    later = aliased(ImportStagingRow)
+    await session.execute(
+        delete(ImportStagingRow).where(
+            _staged(batch_id),
+            exists().where(
+                later.batch_id == ImportStagingRow.batch_id,
+                later.артикул == ImportStagingRow.артикул,
+                later.рядок > ImportStagingRow.рядок,
+            )
+        )
+    )
+    await session.execute(text(f"ANALYZE {ImportStagingRow.__tablename__}"))
+
+
+async def _staged_rows_hash(session, batch_id: str) -> str | None:
+    """Хеш нормалізованого набору рядків завантаження, не залежний від порядку рядків у файлі."""
+    staging = ImportStagingRow
+    return await session.scalar(
+        select(func.md5(func.string_agg(
+            func.concat_ws(':', staging.артикул, _staging_content_hash()),
+            aggregate_order_by(literal_column("','"), staging.артикул)
+        ))).where(_staged(batch_id))
+    )
+
+
+async def _staged_department_stats(session, batch_id: str) -> dict:
+    """Повертає кількість рядків завантаження по відділах."""
+    result = await session.execute(
+        select(ImportStagingRow.відділ, func.count()).where(_staged(batch_id)).group_by(ImportStagingRow.відділ)
+    )
+    return dict(result.all())
+
+
+async def _hash_import_staging(session, batch_id: str) -> bool:
+    """
+    Записує в рядки завантаження хеш їхнього вмісту (порівнюється з `Product.хеш_даних`).
+
+    Тут `products` не читається: усе, що залежить від поточних товарів, рахується
+    вже під час перенесення. Повертає, чи була у файлі колонка "м".
+    """
+    staging = ImportStagingRow
+    # Колонки "м" у файлі не було, якщо в жодному рядку місяці не заповнені
+    has_months_column = await session.scalar(
+        select(exists().where(_staged(batch_id), staging.місяці_без_руху.isnot(None)))
+    )
+    await session.execute(
+        update(staging).where(_staged(batch_id)).values(хеш_даних=_staging_content_hash())
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(text(f"ANALYZE {staging.__tablename__}"))
+    return has_months_column
+
+
+def _import_product_values(source, has_months_column: bool) -> dict:
+    """
+    Значення товару з рядка імпорту (`source` — рядки завантаження або `excluded` upsert).
+
+    Стару ціну вираз бере з того рядка `products`, який саме переписується, тож рішення
+    приймається в момент запису, а не за знімком, прочитаним раніше.
+    """
+    # Якщо у файлі немає ціни, а в базі вона є, зберігаємо стару ціну та перераховуємо суму
+    keep_old_price = (source.ціна == 0.0) & (Product.ціна > 0.0)
+    values = {
+        "назва": source.назва, "відділ": source.відділ, "група": source.група, "кількість": source.кількість,
+        "ціна": case((keep_old_price, Product.ціна), else_=source.ціна),
+        "сума_залишку": case(
+            (keep_old_price, _stock_quantity_expr(source.кількість) * Product.ціна), else_=source.сума_залишку
+        ),
+        "активний": True, "хеш_даних": source.хеш_даних,
+    }
+    if has_months_column:
+        values["місяці_без_руху"] = source.місяці_без_руху
+    return values
+
+
+def _import_changes_product(source):
+    """SQL-умова: рядок імпорту змінює товар (інший хеш вмісту або товар неактивний)."""
+    # Товари з тим самим хешем не переписуються: менше WAL і роботи для VACUUM
+    return Product.хеш_даних.is_distinct_from(source.хеш_даних) | (Product.активний == False)
+
+
+async def _swap_in_import_staging(session, batch_id: str, has_months_column: bool) -> dict:
+    """
+    Переносить рядки завантаження в `products`, зіставляючи товари за артикулом.
+
+    Чи змінився товар і яку ціну лишити, вирішується в тих самих запитах, що пишуть
+    у `products`, тож зміни, зроблені між завантаженням і застосуванням (списання
+    зібраного, інший імпорт), враховуються. id наявних товарів не змінюються.
+    """
+    staging = ImportStagingRow
+    in_staging = exists().where(_staged(batch_id), staging.артикул == Product.артикул)
+    reactivated_count = await session.scalar(
+        select(func.count()).select_from(Product).where(Product.активний == False, in_staging)
+    )
+    updated_result = await session.execute(
+        update(Product)
+        .where(_staged(batch_id), staging.артикул == Product.артикул, _import_changes_product(staging))
+        .values(_import_product_values(staging, has_months_column))
+        .execution_options(synchronize_session=False)
+    )
+    # Артикул, який інша транзакція встигла додати після UPDATE, оновлюється через upsert
+    insert_stmt = insert(Product).from_select(
+        ["артикул", "назва", "відділ", "група", "кількість", "місяці_без_руху", "сума_залишку", "ціна", "активний", "відкладено", "хеш_даних"],
+        select(
+            staging.артикул, staging.назва, staging.відділ, staging.група, staging.кількість,
+            func.coalesce(staging.місяці_без_руху, 0), staging.сума_залишку, staging.ціна,
+            true(), literal(0), staging.хеш_даних
+        ).where(_staged(batch_id), ~exists().where(Product.артикул == staging.артикул))
+    )
+    upserted = (await session.execute(
+        insert_stmt.on_conflict_do_update(
+            index_elements=[Product.артикул],
+            set_=_import_product_values(insert_stmt.excluded, has_months_column),
+            where=_import_changes_product(insert_stmt.excluded),
+        ).returning(literal_column("xmax = 0").label("inserted"))
+    )).scalars().all()
+    added_count = sum(1 for inserted in upserted if inserted)
+    deactivated_result = await session.execute(
+        update(Product)
+        .where(Product.активний == True, ~in_staging)
+        .values(активний=False)
+        .execution_options(synchronize_session=False)
+    )
+    return {
+        'added': added_count, 'updated': updated_result.rowcount + len(upserted) - added_count,
+        'deactivated': deactivated_result.rowcount, 'reactivated': reactivated_count,
+    }
+
+
+async def _affected_cart_lines(session, batch_id: str) -> list[dict]:
+    """
+    Позиції активних тимчасових списків, яких торкнеться імпорт: товар буде деактивовано
+    або доступний для збереження залишок (кількість мінус `відкладено`) зменшиться.
+
+    Викликається в транзакції перенесення перед `_swap_in_import_staging`: товари цих
+    позицій блокуються на читання, тож залишки не зміняться до коміту імпорту.
+    """
+    staging = ImportStagingRow
+    old_available = _stock_quantity_expr() - func.coalesce(Product.відкладено, 0)
+    # Після імпорту `відкладено` обнуляється, тож доступним стає весь новий залишок
+    new_available = case((staging.id.is_(None), 0.0), else_=_stock_quantity_expr(staging.кількість))
+    deactivated = staging.id.is_(None)
+    result = await session.execute(
+        select(
+            TempList.user_id, Product.артикул.label("article"), TempList.quantity,
+            old_available.label("old"), new_available.label("new"), deactivated.label("deactivated"),
+        )
+        .join(Product, Product.id == TempList.product_id)
+        .outerjoin(staging, (staging.артикул == Product.артикул) & _staged(batch_id))
+        .where(Product.активний == True, deactivated | (new_available < old_available))
+        .order_by(TempList.user_id, Product.артикул)
+        .with_for_update(read=True, of=Product)
+    )
+    return [row._asdict() for row in result]
+
+
+def _is_lock_timeout(error: DBAPIError) -> bool:
+    """Чи перервано запит через `lock_timeout` (SQLSTATE 55P03)."""
+    return (getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)) == "55P03"
+
+
+async def _top_staged_changes(session, batch_id: str, old_value, new_value) -> list[dict]:
+    """Найбільші за модулем зміни значення по кожному відділу завантаження."""
+    staging = ImportStagingRow
+    ranked = (
+        select(
+            staging.відділ.label("department"), staging.артикул.label("article"),
+            old_value.label("old"), new_value.label("new"),
+            func.row_number().over(
+                partition_by=staging.відділ, order_by=func.abs(new_value - old_value).desc()
+            ).label("rank"),
+        )
+        .join(Product, Product.артикул == staging.артикул)
+        .where(_staged(batch_id), new_value != old_value)
+        .subquery()
+    )
+    result = await session.execute(
+        select(ranked.c.department, ranked.c.article, ranked.c.old, ranked.c.new)
+        .where(ranked.c.rank <= PREVIEW_TOP_CHANGES)
+        .order_by(ranked.c.department, ranked.c.rank)
+    )
+    return [row._asdict() for row in result]
+
+
+async def orm_stage_import(chunks: Iterable[pd.DataFrame] | pd.DataFrame) -> dict:
+    """
+    Розбирає файл імпорту й зберігає його рядки в `import_staging_rows`, не чіпаючи `products`.
+
+    Приймає DataFrame або ітератор пачок DataFrame (див. `iter_xlsx_chunks`). Пачки
+    розбираються паралельно в пулі процесів (до IMPORT_WORKERS одночасно) і одна за
+    одною копіюються в БД, тож пам'ять не залежить від розміру файлу.
+    `ImportValidationError` та `ImportReadError`, підняті ітератором або через
+    непридатний вміст файлу, скасовують завантаження і передаються викликачу.
+
+    Повертає {'batch_id', 'rows_hash', 'total_in_file', 'department_stats'} або порожній
+    словник у разі помилки.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    chunk_iterator = iter(chunks)
+    loop = asyncio.get_running_loop()
+    executor = get_import_executor()
+    pending: deque[asyncio.Future] = deque()
+    batch_id = uuid.uuid4().hex
 
+    try:
         async with async_session() as session:
-            existing_products_result = await session.execute(select(Product))
-            existing_products = {p.артикул: p for p in existing_products_result.scalars()}
-            db_articles = set(existing_products.keys())
-
-            articles_to_add = file_articles - db_articles
-            articles_to_update = db_articles.intersection(file_articles)
-            articles_to_deactivate = db_articles - file_articles
-
-            if articles_to_deactivate:
-                stmt = update(Product).where(Product.артикул.in_(articles_to_deactivate), Product.активний == True).values(активний=False)
-                result = await session.execute(stmt)
-                deactivated_count = result.rowcount
-
-            if articles_to_update:
-                products_to_update_mappings = []
-                for article in articles_to_update:
-                    if not existing_products[article].активний:
-                        reactivated_count += 1
-                    
-                    if file_articles_data[article]["ціна"] == 0.0 and existing_products[article].ціна > 0.0:
-                        price = existing_products[article].ціна
-                        file_articles_data[article]["ціна"] = price
-                        quantity = float(_normalize_value(file_articles_data[article]["кількість"], is_float=True))
-                        file_articles_data[article]["сума_залишку"] = quantity * price
-                    
-                    if file_articles_data[article]["місяці_без_руху"] is None:
-                        file_articles_data[article]["місяці_без_руху"] = existing_products[article].місяці_без_руху
-
-                    update_data = {"id": existing_products[article].id, "артикул": article, **file_articles_data[article]}
-                    products_to_update_mappings.append(update_data)
-                
-                if products_to_update_mappings:
-                    await session.bulk_update_mappings(Product, products_to_update_mappings)
-                    updated_count = len(products_to_update_mappings)
-
-            if articles_to_add:
-                for article in articles_to_add:
-                    if file_articles_data[article]["місяці_без_руху"] is None:
-                        file_articles_data[article]["місяці_без_руху"] = 0
-                products_to_add_objects = [Product(артикул=article, **file_articles_data[article]) for article in articles_to_add]
-                if products_to_add_objects:
-                    session.add_all(products_to_add_objects)
-                    added_count = len(products_to_add_objects)
-            
-            await session.execute(update(Product).values(відкладено=0))
-            await session.commit()
+            async with session.begin():
+                await session.execute(
+                    delete(ImportStagingRow).where(
+                        ImportStagingRow.created_at < func.now() - timedelta(hours=STAGED_IMPORT_TTL_HOURS)
+                    )
+                )
+                chunks_count = 0
+                while (chunk := await asyncio.to_thread(next, chunk_iterator, None)) is not None:
+                    df_columns_lower = {str(col).lower() for col in chunk.columns}
+                    if not REQUIRED_IMPORT_COLUMNS.issubset(df_columns_lower):
+                        missing = REQUIRED_IMPORT_COLUMNS - df_columns_lower
+                        raise ImportReadError(f"відсутні колонки: {', '.join(missing)}")
+                    chunks_count += 1
+
+                    # Поки пул розбирає пачки, наступні читаються, а готові копіюються в БД
+                    pending.append(loop.run_in_executor(executor, parse_import_dataframe, chunk))
+                    if len(pending) >= IMPORT_WORKERS:
+                        await _copy_to_import_staging(session, batch_id, await pending.popleft())
+                while pending:
+                    await _copy_to_import_staging(session, batch_id, await pending.popleft())
+
+                if not chunks_count:
+                    raise ImportReadError("файл не містить рядків з даними")
+
+                await _finalize_import_staging(session, batch_id)
+                department_stats = await _staged_department_stats(session, batch_id)
+                rows_hash = await _staged_rows_hash(session, batch_id)
+
+        return {
+            'batch_id': batch_id, 'rows_hash': rows_hash,
+            'total_in_file': sum(department_stats.values()), 'department_stats': department_stats,
+        }
+
+    except (ImportValidationError, ImportReadError):
+        raise
+    except Exception as e:
+        logger.error(f"Помилка під час завантаження файлу імпорту: {e}", exc_info=True)
+        return {}
+    finally:
+        for future in pending:
+            future.cancel()
+        # Закриваємо ітератор поза циклом подій: джерело може зупиняти процес читання
+        if hasattr(chunk_iterator, "close"):
+            await asyncio.to_thread(chunk_iterator.close)
+
+
+async def orm_preview_staged_import(batch_id: str) -> dict:
+    """
+    Рахує, що зробить застосування завантаження, нічого не змінюючи в `products`.
+
+    Повертає ті самі лічильники, що й імпорт, а також найбільші зміни ціни
+    (`price_changes`) та залишку (`stock_changes`) по відділах.
+    """
+    staging = ImportStagingRow
+    async with async_session() as session:
+        in_staging = exists().where(_staged(batch_id), staging.артикул == Product.артикул)
+        added, updated, total_in_file = (await session.execute(
+            select(
+                func.count().filter(Product.id.is_(None)),
+                func.count().filter(
+                    Product.id.isnot(None)
+                    & (Product.хеш_даних.is_distinct_from(_staging_content_hash()) | (Product.активний == False))
+                ),
+                func.count(),
+            )
+            .select_from(staging)
+            .outerjoin(Product, Product.артикул == staging.артикул)
+            .where(_staged(batch_id))
+        )).one()
+        reactivated = await session.scalar(
+            select(func.count()).select_from(Product).where(Product.активний == False, in_staging)
+        )
+        deactivated = await session.scalar(
+            select(func.count()).select_from(Product).where(Product.активний == True, ~in_staging)
+        )
+
+        # Нульова ціна у файлі не затирає наявну (див. _import_product_values)
+        new_price = case(((staging.ціна == 0.0) & (Product.ціна > 0.0), Product.ціна), else_=staging.ціна)
+        price_changes = await _top_staged_changes(session, batch_id, Product.ціна, new_price)
+        stock_changes = await _top_staged_changes(
+            session, batch_id, _stock_quantity_expr(), _stock_quantity_expr(staging.кількість)
+        )
+
+    return {
+        'added': added, 'updated': updated, 'unchanged': total_in_file - added - updated,
+        'deactivated': deactivated, 'reactivated': reactivated, 'total_in_file': total_in_file,
+        'price_changes': price_changes, 'stock_changes': stock_changes,
+    }
+
+
+async def orm_apply_staged_import(batch_id: str, file_hash: str | None = None) -> dict:
+    """
+    Застосовує раніше завантажений файл до `products` і видаляє його рядки з `import_staging_rows`.
+    Успішний імпорт записується в `import_log` (див. `orm_is_import_unchanged`).
+
+    Повертає лічильники змін, статистику по відділах і позиції кошиків, яких торкнувся
+    імпорт (`affected_lines`), або порожній словник, якщо завантаження не знайдено чи сталася помилка.
+    """
+    try:
+        async with async_session() as session:
+            async with session.begin():
+                department_stats = await _staged_department_stats(session, batch_id)
+                if not department_stats:
+                    logger.warning("Завантаження імпорту %s не знайдено або воно застаріло.", batch_id)
+                    return {}
+                rows_hash = await _staged_rows_hash(session, batch_id)
+                has_months_column = await _hash_import_staging(session, batch_id)
+
+            # Коротка транзакція: не чекаємо довго на блокування, які тримають збереження списків,
+            # і не змушуємо їх чекати на нас — у разі конфлікту повторюємо трохи згодом
+            for attempt in range(1, IMPORT_SWAP_ATTEMPTS + 1):
+                try:
+                    async with session.begin():
+                        await session.execute(text(f"SET LOCAL lock_timeout = '{IMPORT_LOCK_TIMEOUT_MS}ms'"))
+                        affected_lines = await _affected_cart_lines(session, batch_id)
+                        counters = await _swap_in_import_staging(session, batch_id, has_months_column)
+                        reset_result = await session.execute(
+                            update(Product).where(Product.відкладено != 0).values(відкладено=0)
+                        )
+                        await session.execute(delete(ImportStagingRow).where(_staged(batch_id)))
+                    break
+                except DBAPIError as e:
+                    if not _is_lock_timeout(e) or attempt == IMPORT_SWAP_ATTEMPTS:
+                        raise
+                    logger.warning("Імпорт: товари зайняті, повторна спроба %s/%s.", attempt, IMPORT_SWAP_ATTEMPTS)
+                    await asyncio.sleep(attempt * 0.5)
+
+            if counters['added'] or counters['updated'] or counters['deactivated'] or reset_result.rowcount:
+                await orm_bump_catalogue_version()
+
+            catalogue_version, _ = await orm_get_data_versions()
+            async with session.begin():
+                session.add(ImportLog(file_hash=file_hash, rows_hash=rows_hash, catalogue_version=catalogue_version))
+
+            total_in_db = await session.scalar(select(func.count(Product.id)).where(Product.активний == True))
+
+        total_in_file = sum(department_stats.values())
+        unchanged = total_in_file - counters['added'] - counters['updated']
+        return {
+            **counters, 'unchanged': unchanged, 'total_in_db': total_in_db,
+            'total_in_file': total_in_file, 'department_stats': department_stats,
+            'affected_lines': affected_lines,
+        }
 
-            total_in_db_result = await session.execute(select(func.count(Product.id)).where(Product.активний == True))
-            total_in_db = total_in_db_result.scalar_one()
+    except Exception as e:
+        logger.error(f"Помилка під час застосування імпорту: {e}", exc_info=True)
+        return {}
 
-            for data in file_articles_data.values():
-                dep = data["відділ"]
-                department_stats[dep] = department_stats.get(dep, 0) + 1
-            
-            return {'added': added_count, 'updated': updated_count, 'deactivated': deactivated_count, 'reactivated': reactivated_count, 'total_in_db': total_in_db, 'total_in_file': len(file_articles), 'department_stats': department_stats}
 
-    except Exception as e:
-        logger.error(f"Помилка під час асинхронного імпорту: {e}", exc_info=True)
+async def orm_is_import_unchanged(file_hash: str | None = None, rows_hash: str | None = None) -> bool:
+    """
+    Перевіряє, чи збігається файл (за хешем файлу або нормалізованих рядків) з останнім
+    успішним імпортом і чи не змінювався каталог відтоді. Тоді повторний імпорт нічого не змінить.
+    """
+    async with async_session() as session:
+        last_import = await session.scalar(select(ImportLog).order_by(ImportLog.id.desc()).limit(1))
+    if last_import is None:
+        return False
+
+    catalogue_version, _ = await orm_get_data_versions()
+    if last_import.catalogue_version != catalogue_version:
+        return False
+    return bool(
+        (file_hash and last_import.file_hash == file_hash)
+        or (rows_hash and last_import.rows_hash == rows_hash)
+    )
+
+
+async def orm_discard_staged_import(batch_id: str):
+    """Видаляє непідтверджене завантаження імпорту."""
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(delete(ImportStagingRow).where(_staged(batch_id)))
+
+
+# --- ЗМІНА: Функція перероблена на асинхронну ---
+async def orm_smart_import(chunks: Iterable[pd.DataFrame] | pd.DataFrame) -> dict:
+    """
+    Асинхронно виконує "розумний" імпорт товарів у базу даних: завантажує файл
+    (див. `orm_stage_import`) і одразу застосовує його.
+    """
+    staged = await orm_stage_import(chunks)
+    if not staged:
         return {}
+    try:
+        return await orm_apply_staged_import(staged['batch_id'])
+    finally:
+        await orm_discard_staged_import(staged['batch_id'])
 
 
 # --- ЗМІНА: Функція перероблена на асинхронну ---
 async def orm_subtract_collected(dataframe: pd.DataFrame) -> dict:
-    """Асинхронно віднімає кількість зібраних товарів від залишків."""
-    processed_count, not_found_count, error_count = 0, 0, 0
+    """
+    Асинхронно віднімає кількість зібраних товарів від залишків.
+
+    Кількості спершу сумуються по артикулу, після чого всі залишки оновлюються одним
+    запитом `UPDATE ... FROM unnest(...)`, який заодно повідомляє, які артикули знайдено.
+    Лічильники в результаті, як і раніше, рахуються в рядках файлу.
+    """
+    articles = dataframe["артикул"].astype(str).str.strip()
+    quantities = pd.to_numeric(dataframe["кількість"].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    has_article = articles != ""
+    error_count = int((has_article & quantities.isna()).sum())
+
+    valid = has_article & quantities.notna()
+    collected_rows = (
+        pd.DataFrame({"артикул": articles[valid], "кількість": quantities[valid]})
+        .groupby("артикул")["кількість"].agg(["sum", "size"])
+    )
+    if collected_rows.empty:
+        return {'processed': 0, 'not_found': 0, 'errors': error_count}
+
+    source = func.unnest(
+        literal(collected_rows.index.tolist(), ARRAY(String)),
+        literal(collected_rows["sum"].astype(float).tolist(), ARRAY(Float)),
+    ).table_valued("article", "quantity").render_derived(name="collected_source")
+    collected = select(source.c.article, source.c.quantity).cte("collected")
+
+    new_stock = _stock_quantity_expr() - collected.c.quantity
+    updated = (
+        update(Product)
+        .where(Product.артикул == collected.c.article, _is_numeric_text(Product.кількість))
+        # Скидаємо хеш: залишок уже не збігається з файлом, тож наступний імпорт має його переписати
+        .values(
+            кількість=cast(new_stock, String), сума_залишку=new_stock * func.coalesce(Product.ціна, 0.0),
+            хеш_даних=None,
+        )
+        .returning(Product.артикул)
+        .cte("updated")
+    )
+    # Основний запит бачить стан до оновлення, тож `found` — це наявність артикула в базі
+    stmt = (
+        select(collected.c.article, (Product.id.isnot(None)).label("found"), (updated.c.артикул.isnot(None)).label("updated"))
+        .select_from(collected)
+        .outerjoin(Product, Product.артикул == collected.c.article)
+        .outerjoin(updated, updated.c.артикул == collected.c.article)
+    )
     async with async_session() as session:
-        for _, row in dataframe.iterrows():
-            article = str(row.get("артикул", "")).strip()
-            if not article:
-                continue
-
-            product_result = await session.execute(select(Product).where(Product.артикул == article))
-            product = product_result.scalar_one_or_none()
-            if not product:
-                not_found_count += 1
-                logger.warning(f"Віднімання: товар {article} не знайдено.")
-                continue
-
-            try:
-                current_stock = float(str(product.кількість).replace(',', '.'))
-                quantity_to_subtract = float(str(row["кількість"]).replace(',', '.'))
-                new_stock = current_stock - quantity_to_subtract
-                price = product.ціна or 0.0
-                new_stock_sum = new_stock * price
-
-                await session.execute(update(Product).where(Product.id == product.id).values(кількість=str(new_stock), сума_залишку=new_stock_sum))
-                processed_count += 1
-            except (ValueError, TypeError) as e:
-                error_count += 1
-                logger.error(f"Помилка конвертації для артикула {article}: {e}")
-                continue
-        await session.commit()
+        async with session.begin():
+            outcome = (await session.execute(stmt)).all()
+
+    processed_count, not_found_count, not_found_articles = 0, 0, []
+    for article, found, was_updated in outcome:
+        rows_count = int(collected_rows.at[article, "size"])
+        if was_updated:
+            processed_count += rows_count
+        elif not found:
+            not_found_count += rows_count
+            not_found_articles.append(article)
+        else:
+            # Товар є, але його поточний залишок не є числом
+            error_count += rows_count
+            logger.error(f"Віднімання: залишок товару {article} не є числом.")
+    if not_found_articles:
+        logger.warning(f"Віднімання: не знайдено {len(not_found_articles)} артикулів, напр. {', '.join(not_found_articles[:10])}.")
+
+    if processed_count:
+        await orm_bump_catalogue_version()
     return {'processed': processed_count, 'not_found': not_found_count, 'errors': error_count}
 
 
@@ -220,6 +611,18 @@ async def orm_get_product_by_id(session, product_id: int, for_update: bool = Fal
     return result.scalar_one_or_none()
 
 
+async def orm_lock_products(session, product_ids: Iterable[int]):
+    """
+    Блокує рядки товарів (`FOR UPDATE`) у порядку зростання id.
+
+    Однаковий порядок блокувань у всіх транзакціях не дає паралельним збереженням
+    списків взаємно заблокувати одне одного (deadlock).
+    """
+    await session.execute(
+        select(Product.id).where(Product.id.in_(set(product_ids))).order_by(Product.id).with_for_update()
+    )
+
+
 # --- Функції для звітів ---
 
 # --- ЗМІНА: Функція перероблена на асинхронну ---
@@ -228,4 +631,39 @@ async def orm_get_all_products_async() -> list[Product]:
     async with async_session() as session:
         query = select(Product).where(Product.активний == True).order_by(Product.відділ, Product.назва)
         result = await session.execute(query)
-        return result.scalars().all()
\ No newline at end of file
+        return result.scalars().all()
+
+
+async def orm_stream_stock_report_rows(batch_size: int = 1000):
+    """
+    Асинхронно віддає рядки звіту по залишкам пачками через серверний курсор.
+
+    Резерви з тимчасових списків агрегуються в БД, доступна кількість і сума
+    рахуються тим самим запитом. Читання йде в знімку REPEATABLE READ READ ONLY,
+    тому звіт узгоджений, а пам'ять не залежить від розміру каталогу.
+    """
+    reservations = (
+        select(TempList.product_id, func.sum(TempList.quantity).label("reserved"))
+        .group_by(TempList.product_id)
+        .subquery()
+    )
+    available = (
+        _stock_quantity_expr()
+        - func.coalesce(Product.відкладено, 0)
+        - func.coalesce(reservations.c.reserved, 0)
+    )
+    query = (
+        select(
+            Product.відділ, Product.група, Product.назва,
+            available.label("available"),
+            func.round(cast(available * func.coalesce(Product.ціна, 0.0), Numeric), 2).label("available_sum"),
+        )
+        .outerjoin(reservations, reservations.c.product_id == Product.id)
+        .where(Product.активний == True)
+        .order_by(Product.відділ, Product.назва)
+    )
+    async with async_session() as session:
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+        result = await session.stream(query)
+        async for partition in result.partitions(batch_size):
+            yield partition
@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 # --- ЗМІНА: Видаляємо імпорт sync_session ---
 from database.engine import async_session
 from database.models import Product, TempList, SavedList
+from database.orm.versions import orm_bump_reservation_version
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ async def orm_clear_temp_list(user_id: int):
         query = delete(TempList).where(TempList.user_id == user_id)
         await session.execute(query)
         await session.commit()
+    await orm_bump_reservation_version()
 
 
 async def orm_add_item_to_temp_list(user_id: int, product_id: int, quantity: int):
@@ -36,6 +38,7 @@ async def orm_add_item_to_temp_list(user_id: int, product_id: int, quantity: int
             session.add(new_item)
 
         await session.commit()
+    await orm_bump_reservation_version()
 
 
 async def orm_update_temp_list_item_quantity(user_id: int, product_id: int, new_quantity: int):
@@ -44,6 +47,7 @@ async def orm_update_temp_list_item_quantity(user_id: int, product_id: int, new_
         stmt = update(TempList).where(TempList.user_id == user_id, TempList.product_id == product_id).values(quantity=new_quantity)
         await session.execute(stmt)
         await session.commit()
+    await orm_bump_reservation_version()
 
 
 async def orm_delete_temp_list_item(user_id: int, product_id: int):
@@ -52,6 +56,7 @@ async def orm_delete_temp_list_item(user_id: int, product_id: int):
         stmt = delete(TempList).where(TempList.user_id == user_id, TempList.product_id == product_id)
         await session.execute(stmt)
         await session.commit()
+    await orm_bump_reservation_version()
 
 
 async def orm_get_temp_list(user_id: int) -> list[TempList]:
@@ -3,7 +3,7 @@
 import logging
 from typing import List
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.dialects.postgresql import insert
 
 # --- ЗМІНА: Видаляємо імпорт sync_session ---
@@ -17,7 +17,10 @@ async def orm_upsert_user(user_id: int, username: str | None, first_name: str):
     """Додає нового користувача або оновлює дані існуючого."""
     async with async_session() as session:
         stmt = insert(User).values(id=user_id, username=username, first_name=first_name)
-        stmt = stmt.on_conflict_do_update(index_elements=['id'], set_={'username': username, 'first_name': first_name})
+        # Користувач знову пише боту, отже розблокував його
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id'], set_={'username': username, 'first_name': first_name, 'is_blocked': False}
+        )
         await session.execute(stmt)
         await session.commit()
 
@@ -26,6 +29,12 @@ async def orm_upsert_user(user_id: int, username: str | None, first_name: str):
 async def orm_get_all_users_async() -> List[int]:
     """Асинхронно отримує ID всіх зареєстрованих користувачів для розсилки."""
     async with async_session() as session:
-        query = select(User.id)
+        query = select(User.id).where(User.is_blocked == False)
         result = await session.execute(query)
-        return list(result.scalars().all())
\ No newline at end of file
+        return list(result.scalars().all())
+
+async def orm_mark_users_blocked(user_ids: List[int]):
+    """Позначає користувачів, які заблокували бота."""
+    async with async_session() as session:
+        await session.execute(update(User).where(User.id.in_(user_ids)).values(is_blocked=True))
+        await session.commit()
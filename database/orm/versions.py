@@ -0,0 +1,62 @@
+# epicservice/database/orm/versions.py
+
+import logging
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from database.engine import async_session
+from database.models import (ReportCacheEntry, catalogue_version_seq,
+                             reservation_version_seq)
+
+logger = logging.getLogger(__name__)
+
+
+# Версії інкрементуються ПІСЛЯ коміту зміни: читач, що бачить нову версію,
+# гарантовано бачить і нові дані, тож у кеші не залишиться застарілого звіту.
+
+async def orm_bump_catalogue_version():
+    """Збільшує версію каталогу (після імпорту або віднімання залишків)."""
+    async with async_session() as session:
+        await session.execute(select(catalogue_version_seq.next_value()))
+
+
+async def orm_bump_reservation_version():
+    """Збільшує версію резервів (після змін у кошиках, збережених списках)."""
+    async with async_session() as session:
+        await session.execute(select(reservation_version_seq.next_value()))
+
+
+async def orm_get_data_versions() -> tuple[int, int]:
+    """Повертає поточні версії каталогу та резервів одним запитом."""
+    async with async_session() as session:
+        # До першого nextval last_value вже дорівнює 1, а перший nextval теж поверне 1,
+        # тож невикликана послідовність має давати 0, інакше перша зміна не змінить версію
+        result = await session.execute(text(
+            "SELECT (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM catalogue_version_seq), "
+            "(SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM reservation_version_seq)"
+        ))
+        catalogue_version, reservation_version = result.one()
+        return catalogue_version, reservation_version
+
+
+async def orm_get_cached_report(kind: str, versions: tuple[int, int]) -> Optional[str]:
+    """Повертає file_id збереженого звіту, якщо його зібрано саме з цих версій даних."""
+    async with async_session() as session:
+        return await session.scalar(
+            select(ReportCacheEntry.file_id).where(
+                ReportCacheEntry.kind == kind,
+                ReportCacheEntry.catalogue_version == versions[0],
+                ReportCacheEntry.reservation_version == versions[1],
+            )
+        )
+
+
+async def orm_store_cached_report(kind: str, versions: tuple[int, int], file_id: str):
+    """Зберігає file_id звіту для вказаних версій даних (замінює попередній запис цього типу)."""
+    values = {"kind": kind, "catalogue_version": versions[0], "reservation_version": versions[1], "file_id": file_id}
+    stmt = insert(ReportCacheEntry).values(values)
+    async with async_session() as session:
+        await session.execute(stmt.on_conflict_do_update(index_elements=[ReportCacheEntry.kind], set_=values))
+        await session.commit()
@@ -107,7 +107,7 @@ async def view_user_archive(callback: CallbackQuery, state: FSMContext):
         await callback.answer(LEXICON.UNEXPECTED_ERROR, show_alert=True)
 
 
-@router.callback_query(F.data.startswith("download_zip:"))
+@router.callback_query(F.data.startswith("download_zip:"), flags={"heavy": True})
 async def download_zip_handler(callback: CallbackQuery, state: FSMContext, bot: Bot):
     """
     Обробляє запит на пакування та відправку ZIP-архіву.
@@ -34,7 +34,8 @@ async def _show_admin_panel(event: Union[Message, CallbackQuery], state: FSMCont
     Відображає головне меню адмін-панелі, керуючи станом повідомлення.
     """
     text = LEXICON.ADMIN_PANEL_GREETING
-    reply_markup = get_admin_panel_kb()
+    data = await state.get_data()
+    reply_markup = get_admin_panel_kb(data.get("report_format", "xlsx"))
 
     if isinstance(event, Message):
         # Якщо це нове повідомлення, прибираємо попередню клавіатуру
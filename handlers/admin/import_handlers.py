@@ -3,25 +3,35 @@
 import asyncio
 import logging
 import os
-from typing import List
+from typing import Iterable, Iterator, Optional
 
 import pandas as pd
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.base import StorageKey
 from aiogram.types import (CallbackQuery, InlineKeyboardButton,
                            InlineKeyboardMarkup, Message)
 from sqlalchemy.exc import SQLAlchemyError
 
 from config import ADMIN_IDS
-from database.orm import (orm_get_all_products_async, orm_get_all_users_async,
-                          orm_get_users_with_active_lists, orm_smart_import)
+from database.orm import (orm_apply_staged_import, orm_discard_staged_import,
+                          orm_get_all_products_async, orm_get_all_users_async,
+                          orm_get_users_with_active_lists,
+                          orm_is_import_unchanged, orm_preview_staged_import,
+                          orm_stage_import)
 from handlers.admin.core import _show_admin_panel
 from keyboards.inline import (get_admin_lock_kb, get_admin_main_kb,
-                              get_notify_confirmation_kb, get_user_main_kb)
+                              get_import_preview_kb, get_notify_confirmation_kb,
+                              get_user_main_kb)
 from lexicon.lexicon import LEXICON
-from utils.force_save_helper import force_save_user_list
+from utils.broadcast_queue import enqueue_broadcast
+from utils.card_generator import format_quantity
+from utils.force_save_helper import force_save_user_lists
+from utils.import_parser import (ARTICLE_PATTERN, REQUIRED_IMPORT_COLUMNS,
+                                 ImportReadError, ImportValidationError,
+                                 clean_numeric_text)
+from utils.import_pool import iter_chunks_in_subprocess
+from utils.import_reader import IMPORT_READERS, file_sha256, get_import_extension
 
 # Налаштовуємо логер
 logger = logging.getLogger(__name__)
@@ -34,32 +44,99 @@ router.callback_query.filter(F.from_user.id.in_(ADMIN_IDS))
 
 class AdminImportStates(StatesGroup):
     waiting_for_import_file = State()
+    import_preview = State()
     lock_confirmation = State()
     notify_confirmation = State()
 
 
-def _validate_excel_columns(df: pd.DataFrame) -> tuple[bool, str]:
-    df_columns_lower = {str(col).lower() for col in df.columns}
-    required_columns = {"в", "г", "н", "к"}
+MAX_VALIDATION_ERRORS = 10
+# Ліміт Telegram на довжину повідомлення — 4096 символів, лишаємо запас
+MAX_PREVIEW_LENGTH = 3800
+MAX_AFFECTED_LINES_PER_USER = 30
+
+
+def _validate_excel_columns(columns: Iterable) -> tuple[bool, str]:
+    df_columns_lower = {str(col).lower() for col in columns}
     
-    if not required_columns.issubset(df_columns_lower):
-        missing_columns = required_columns - df_columns_lower
+    if not REQUIRED_IMPORT_COLUMNS.issubset(df_columns_lower):
+        missing_columns = REQUIRED_IMPORT_COLUMNS - df_columns_lower
         return False, ", ".join(missing_columns)
     return True, ""
 
 
-def _validate_excel_data(df: pd.DataFrame) -> List[str]:
-    errors = []
-    df_copy = df.copy()
-    df_copy.rename(columns={"в": "відділ", "н": "назва"}, inplace=True)
-
-    for index, row in df_copy.iterrows():
-        if pd.notna(row["назва"]) and not isinstance(row.get("відділ"), (int, float)):
-            errors.append(f"Рядок {index + 2}: 'відділ' має бути числом, а не '{row.get('відділ')}'")
-        if len(errors) >= 10:
-            errors.append("... та інші помилки.")
-            break
-    return errors
+def _first_offenders(mask: pd.Series, limit: int) -> pd.Index:
+    """Повертає індекси перших `limit` рядків, для яких маска істинна."""
+    return mask.index[mask.to_numpy()][:limit]
+
+
+def _validate_excel_data(
+    df: pd.DataFrame, seen_articles: dict, limit: int = MAX_VALIDATION_ERRORS
+) -> tuple[list[tuple[int, str]], int, list[tuple[int, str]], int]:
+    """
+    Перевіряє пачку колонковими масками, без проходу по рядках.
+
+    Помилка (зупиняє імпорт) — лише нечисловий відділ. Рядки без артикула, нечислова
+    кількість та дублікати артикулів імпортуються як і раніше (пропуск, 0, останній рядок),
+    але про них попереджаємо. Повертає перші `limit` помилок і попереджень у вигляді
+    (номер рядка, повідомлення) та їх загальні кількості. `seen_articles`
+    (артикул -> номер рядка) накопичується між пачками, щоб знаходити дублікати по всьому файлу.
+    """
+    has_name = df["н"].notna()
+    names = df["н"].astype(str).str.strip()
+    articles = names.str.extract(ARTICLE_PATTERN, expand=False)
+    row_numbers = pd.Series(df.index + 2, index=df.index)
+
+    department_ok = pd.to_numeric(df["в"], errors='coerce').notna()
+    bad_department = has_name & ~department_ok
+    missing_article = has_name & articles.isna()
+    quantity_ok = pd.to_numeric(clean_numeric_text(df["к"]), errors='coerce').notna()
+    bad_quantity = has_name & df["к"].notna() & ~quantity_ok
+
+    with_article = articles[has_name & articles.notna()]
+    duplicated = with_article.duplicated(keep='first') | with_article.isin(seen_articles.keys())
+    first_rows = with_article[~with_article.duplicated(keep='first')]
+    for article, row_number in zip(first_rows.tolist(), row_numbers[first_rows.index].tolist()):
+        seen_articles.setdefault(article, row_number)
+
+    errors, warnings = [], []
+    for index in _first_offenders(bad_department, limit):
+        errors.append((row_numbers[index], f"Рядок {row_numbers[index]}: 'відділ' має бути числом, а не '{df.at[index, 'в']}'"))
+    for index in _first_offenders(missing_article & ~bad_department, limit):
+        warnings.append((row_numbers[index], f"Рядок {row_numbers[index]}: у назві '{names[index][:40]}' немає артикула, рядок пропущено"))
+    for index in _first_offenders(bad_quantity, limit):
+        warnings.append((row_numbers[index], f"Рядок {row_numbers[index]}: кількість '{df.at[index, 'к']}' не є числом, буде 0"))
+    for index in _first_offenders(duplicated, limit):
+        article = with_article[index]
+        warnings.append((row_numbers[index], f"Рядок {row_numbers[index]}: артикул {article} повторюється (вперше в рядку {seen_articles[article]}), береться останній рядок"))
+
+    warnings_total = int((missing_article & ~bad_department).sum() + bad_quantity.sum() + duplicated.sum())
+    return sorted(errors)[:limit], int(bad_department.sum()), sorted(warnings)[:limit], warnings_total
+
+
+def _limited_messages(items: list[tuple[int, str]], total: int) -> list[str]:
+    messages = [message for _, message in items]
+    if total > len(messages):
+        messages.append(f"... та ще {total - len(messages)}.")
+    return messages
+
+
+def _validated_chunks(chunks: Iterator[pd.DataFrame], warnings: list[str]) -> Iterator[pd.DataFrame]:
+    """
+    Перевіряє кожну пачку на льоту, поки вона йде в базу. Якщо знайдено помилки,
+    після останньої пачки піднімає ImportValidationError, і імпорт відкочується.
+    Попередження після останньої пачки дописуються в `warnings`.
+    """
+    errors, errors_total, found_warnings, warnings_total, seen_articles = [], 0, [], 0, {}
+    for chunk in chunks:
+        chunk_errors, chunk_errors_total, chunk_warnings, chunk_warnings_total = _validate_excel_data(chunk, seen_articles)
+        errors = sorted(errors + chunk_errors)[:MAX_VALIDATION_ERRORS]
+        found_warnings = sorted(found_warnings + chunk_warnings)[:MAX_VALIDATION_ERRORS]
+        errors_total += chunk_errors_total
+        warnings_total += chunk_warnings_total
+        yield chunk
+    if errors_total:
+        raise ImportValidationError(_limited_messages(errors, errors_total))
+    warnings.extend(_limited_messages(found_warnings, warnings_total))
 
 
 def _format_admin_report(result: dict) -> str:
@@ -67,6 +144,7 @@ def _format_admin_report(result: dict) -> str:
         LEXICON.IMPORT_REPORT_TITLE,
         LEXICON.IMPORT_REPORT_ADDED.format(added=result.get('added', 0)),
         LEXICON.IMPORT_REPORT_UPDATED.format(updated=result.get('updated', 0)),
+        LEXICON.IMPORT_REPORT_UNCHANGED.format(unchanged=result.get('unchanged', 0)),
         LEXICON.IMPORT_REPORT_DEACTIVATED.format(deactivated=result.get('deactivated', 0)),
         LEXICON.IMPORT_REPORT_REACTIVATED.format(reactivated=result.get('reactivated', 0)),
         LEXICON.IMPORT_REPORT_TOTAL.format(total=result.get('total_in_db', 0)),
@@ -81,7 +159,43 @@ def _format_admin_report(result: dict) -> str:
     return "\n".join(report_lines)
 
 
-async def broadcast_import_update(bot: Bot, result: dict):
+def _format_import_preview(preview: dict, warnings: Optional[list[str]] = None) -> str:
+    report_lines = [
+        LEXICON.IMPORT_PREVIEW_TITLE,
+        LEXICON.IMPORT_REPORT_ADDED.format(added=preview.get('added', 0)),
+        LEXICON.IMPORT_REPORT_UPDATED.format(updated=preview.get('updated', 0)),
+        LEXICON.IMPORT_REPORT_UNCHANGED.format(unchanged=preview.get('unchanged', 0)),
+        LEXICON.IMPORT_REPORT_DEACTIVATED.format(deactivated=preview.get('deactivated', 0)),
+        LEXICON.IMPORT_REPORT_REACTIVATED.format(reactivated=preview.get('reactivated', 0)),
+        LEXICON.IMPORT_PREVIEW_FILE_ROWS.format(total=preview.get('total_in_file', 0)),
+    ]
+    sections = [
+        (LEXICON.IMPORT_PREVIEW_PRICE_TITLE, preview.get('price_changes', []), "{:.2f}"),
+        (LEXICON.IMPORT_PREVIEW_STOCK_TITLE, preview.get('stock_changes', []), "{:g}"),
+    ]
+    for title, changes, value_format in sections:
+        if not changes:
+            continue
+        report_lines.append(title)
+        report_lines.extend(
+            LEXICON.IMPORT_PREVIEW_CHANGE_ITEM.format(
+                department=change['department'], article=change['article'],
+                old=value_format.format(change['old'] or 0), new=value_format.format(change['new'] or 0)
+            )
+            for change in changes
+        )
+
+    if warnings:
+        report_lines.append(LEXICON.IMPORT_PREVIEW_WARNINGS_TITLE)
+        report_lines.extend(warnings)
+
+    text = "\n".join(report_lines)
+    if len(text) > MAX_PREVIEW_LENGTH:
+        text = text[:text.rfind("\n", 0, MAX_PREVIEW_LENGTH)] + LEXICON.IMPORT_PREVIEW_TRUNCATED
+    return text
+
+
+async def broadcast_import_update(bot: Bot, result: dict, progress_message: Optional[Message] = None):
     try:
         user_ids = await orm_get_all_users_async()
         if not user_ids:
@@ -102,7 +216,8 @@ async def broadcast_import_update(bot: Bot, result: dict):
         )
         departments_part = LEXICON.USER_IMPORT_NOTIFICATION_DEPARTMENTS_TITLE
         dep_stats = result.get('department_stats', {})
-        sorted_deps = sorted(dep_stats.items())
+        # Ключі відділів можуть бути рядками, якщо результат пройшов через JSON (FSM у БД)
+        sorted_deps = sorted(dep_stats.items(), key=lambda item: int(item[0]))
         
         departments_lines = [
             LEXICON.USER_IMPORT_NOTIFICATION_DEPARTMENT_ITEM.format(dep_id=dep_id, count=count)
@@ -114,21 +229,38 @@ async def broadcast_import_update(bot: Bot, result: dict):
             details_part + "\n" + departments_part + "\n".join(departments_lines)
         )
 
-        sent_count = 0
-        for user_id in user_ids:
-            try:
-                kb = get_admin_main_kb() if user_id in ADMIN_IDS else get_user_main_kb()
-                await bot.send_message(user_id, message_text, reply_markup=kb)
-                sent_count += 1
-            except Exception as e:
-                logger.warning("Не вдалося надіслати сповіщення про імпорт користувачу %s: %s", user_id, e)
-        
-        logger.info(f"Розсилку про імпорт завершено. Надіслано {sent_count}/{len(user_ids)} повідомлень.")
+        admin_kb, user_kb = get_admin_main_kb(), get_user_main_kb()
+        messages = [
+            (user_id, message_text, admin_kb if user_id in ADMIN_IDS else user_kb)
+            for user_id in user_ids
+        ]
+        await enqueue_broadcast(messages, progress_message)
 
     except Exception as e:
         logger.error("Критична помилка під час розсилки сповіщень про імпорт: %s", e, exc_info=True)
 
 
+def _format_affected_cart_messages(affected_lines: list[dict]) -> list[tuple[int, str]]:
+    """Групує зачеплені позиції кошиків за користувачами й формує кожному окреме повідомлення."""
+    lines_by_user: dict[int, list[dict]] = {}
+    for line in affected_lines:
+        lines_by_user.setdefault(line['user_id'], []).append(line)
+
+    messages = []
+    for user_id, lines in lines_by_user.items():
+        text_lines = [LEXICON.USER_CART_AFFECTED_TITLE]
+        for line in lines[:MAX_AFFECTED_LINES_PER_USER]:
+            template = LEXICON.USER_CART_AFFECTED_DEACTIVATED if line['deactivated'] else LEXICON.USER_CART_AFFECTED_DROPPED
+            text_lines.append(template.format(
+                article=line['article'], quantity=line['quantity'],
+                old=format_quantity(max(line['old'], 0)), new=format_quantity(max(line['new'], 0))
+            ))
+        if len(lines) > MAX_AFFECTED_LINES_PER_USER:
+            text_lines.append(LEXICON.USER_CART_AFFECTED_MORE.format(count=len(lines) - MAX_AFFECTED_LINES_PER_USER))
+        messages.append((user_id, "\n".join(text_lines)))
+    return messages
+
+
 async def proceed_with_import(message: Message, state: FSMContext, bot: Bot, is_after_force_save: bool = False):
     back_kb = InlineKeyboardMarkup(inline_keyboard=[[
         InlineKeyboardButton(
@@ -161,38 +293,44 @@ async def start_import_handler(callback: CallbackQuery, state: FSMContext, bot:
     await state.set_state(AdminImportStates.lock_confirmation)
     await callback.message.edit_text(
         LEXICON.ACTIVE_LISTS_BLOCK.format(users_info=users_info),
-        reply_markup=get_admin_lock_kb(action='import')
+        # Імпорт не видаляє рядків кошиків: після нього можна сповістити лише тих,
+        # у чиїх списках товар зник або його стало менше (`notify_confirm:affected`)
+        reply_markup=get_admin_lock_kb(action='import', allow_proceed=True)
     )
     await callback.answer("Дію заблоковано", show_alert=True)
 
 
+@router.callback_query(AdminImportStates.lock_confirmation, F.data == "lock:proceed:import")
+async def handle_lock_proceed(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    await proceed_with_import(callback.message, state, bot)
+    await callback.answer()
+
+
 @router.callback_query(AdminImportStates.lock_confirmation, F.data.startswith("lock:notify:"))
 async def handle_lock_notify(callback: CallbackQuery, state: FSMContext, bot: Bot):
     data = await state.get_data()
-    for user_id in data.get('locked_user_ids', []):
-        try:
-            await bot.send_message(user_id, LEXICON.USER_SAVE_LIST_NOTIFICATION)
-        except Exception as e:
-            logger.warning("Не вдалося надіслати сповіщення користувачу %s: %s", user_id, e)
+    await enqueue_broadcast([
+        (user_id, LEXICON.USER_SAVE_LIST_NOTIFICATION, None) for user_id in data.get('locked_user_ids', [])
+    ])
     await callback.answer(LEXICON.NOTIFICATIONS_SENT, show_alert=True)
 
 
-@router.callback_query(AdminImportStates.lock_confirmation, F.data.startswith("lock:force_save:"))
+@router.callback_query(AdminImportStates.lock_confirmation, F.data.startswith("lock:force_save:"), flags={"heavy": True})
 async def handle_lock_force_save(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.edit_text("Почав примусове збереження списків...")
     data = await state.get_data()
     user_ids, action = data.get('locked_user_ids', []), data.get('action_to_perform')
-    
-    results = []
-    for user_id in user_ids:
-        user_state_key = StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)
-        user_state = FSMContext(storage=state.storage, key=user_state_key)
-        results.append(await force_save_user_list(user_id, bot, user_state))
-        
-    all_saved_successfully = all(results)
 
-    if not all_saved_successfully:
-        await callback.message.edit_text("Під час примусового збереження виникли помилки. Спробуйте пізніше.")
+    async def report_progress(done: int, total: int, failed: int):
+        await callback.message.edit_text(LEXICON.FORCE_SAVE_PROGRESS.format(done=done, total=total, failed=failed))
+
+    failed_user_ids = await force_save_user_lists(user_ids, bot, state.storage, report_progress)
+
+    if failed_user_ids:
+        await callback.message.edit_text(LEXICON.FORCE_SAVE_FAILED.format(
+            count=len(failed_user_ids), total=len(user_ids),
+            users="\n".join(LEXICON.FORCE_SAVE_FAILED_USER.format(user_id=user_id) for user_id in failed_user_ids)
+        ))
         await state.set_state(None)
         return
     await callback.answer("Всі списки успішно збережено!", show_alert=True)
@@ -200,48 +338,73 @@ async def handle_lock_force_save(callback: CallbackQuery, state: FSMContext, bot
         await proceed_with_import(callback.message, state, bot, is_after_force_save=True)
 
 
-@router.message(AdminImportStates.waiting_for_import_file, F.document)
+@router.message(AdminImportStates.waiting_for_import_file, F.document, flags={"heavy": True})
 async def process_import_file(message: Message, state: FSMContext, bot: Bot):
-    if not message.document.file_name.endswith((".xlsx", ".xls")):
-        await message.answer(LEXICON.IMPORT_WRONG_FORMAT)
+    file_name = message.document.file_name or ""
+    extension = get_import_extension(file_name)
+    if extension is None:
+        is_legacy_excel = file_name.lower().endswith(".xls")
+        await message.answer(LEXICON.IMPORT_XLS_NOT_SUPPORTED if is_legacy_excel else LEXICON.IMPORT_WRONG_FORMAT)
         return
+    read_header, iter_chunks = IMPORT_READERS[extension]
     
     data = await state.get_data()
     await bot.delete_message(message.chat.id, data.get("main_message_id"))
     
     await message.answer(LEXICON.IMPORT_PROCESSING)
-    temp_file_path = f"temp_import_{message.from_user.id}.xlsx"
+    temp_file_path = f"temp_import_{message.from_user.id}{extension}"
 
     try:
         await bot.download(message.document, destination=temp_file_path)
-        df = await asyncio.to_thread(pd.read_excel, temp_file_path, engine='openpyxl')
+        file_hash = await asyncio.to_thread(file_sha256, temp_file_path)
+        if await orm_is_import_unchanged(file_hash=file_hash):
+            await message.answer(LEXICON.IMPORT_UNCHANGED_FILE)
+            await state.set_state(None)
+            await _show_admin_panel(message, state, bot)
+            return
 
-        is_valid, missing_cols = _validate_excel_columns(df)
+        header = await asyncio.to_thread(read_header, temp_file_path)
+
+        is_valid, missing_cols = _validate_excel_columns(header)
         if not is_valid:
             await message.answer(LEXICON.IMPORT_INVALID_COLUMNS.format(columns=missing_cols))
             return
 
-        errors = _validate_excel_data(df)
-        if errors:
-            await message.answer(LEXICON.IMPORT_VALIDATION_ERRORS_TITLE + "\n".join(errors))
-            return
-
         await message.answer(LEXICON.IMPORT_STARTING)
-        result = await orm_smart_import(df)
-        if not result:
+        warnings: list[str] = []
+        try:
+            staged = await orm_stage_import(
+                _validated_chunks(iter_chunks_in_subprocess(iter_chunks, temp_file_path), warnings)
+            )
+        except ImportValidationError as e:
+            await message.answer(LEXICON.IMPORT_VALIDATION_ERRORS_TITLE + "\n".join(e.errors))
+            return
+        except ImportReadError as e:
+            await message.answer(LEXICON.IMPORT_CRITICAL_READ_ERROR.format(error=str(e)))
+            await _show_admin_panel(message, state, bot)
+            return
+        if not staged:
             await message.answer(LEXICON.IMPORT_SYNC_ERROR.format(error="невідома помилка."))
             return
-        
-        admin_report = _format_admin_report(result)
-        await message.answer(admin_report)
-        
-        await state.update_data(import_result=result)
+        # Той самий набір товарів міг прийти в іншому файлі (інший порядок рядків, формат)
+        if await orm_is_import_unchanged(rows_hash=staged['rows_hash']):
+            await orm_discard_staged_import(staged['batch_id'])
+            await message.answer(LEXICON.IMPORT_UNCHANGED_ROWS)
+            await state.set_state(None)
+            await _show_admin_panel(message, state, bot)
+            return
+
+        # Показуємо, що зміниться, і застосовуємо вже розібрані дані лише після підтвердження
+        preview = await orm_preview_staged_import(staged['batch_id'])
         sent_message = await message.answer(
-            LEXICON.IMPORT_ASK_FOR_NOTIFICATION,
-            reply_markup=get_notify_confirmation_kb()
+            _format_import_preview(preview, warnings),
+            reply_markup=get_import_preview_kb()
+        )
+        await state.set_state(AdminImportStates.import_preview)
+        await state.update_data(
+            import_batch_id=staged['batch_id'], import_file_hash=file_hash,
+            main_message_id=sent_message.message_id
         )
-        await state.set_state(AdminImportStates.notify_confirmation)
-        await state.update_data(main_message_id=sent_message.message_id)
 
     except SQLAlchemyError as e:
         logger.critical("Помилка БД під час імпорту: %s", e, exc_info=True)
@@ -256,6 +419,42 @@ async def process_import_file(message: Message, state: FSMContext, bot: Bot):
             os.remove(temp_file_path)
 
 
+@router.callback_query(AdminImportStates.import_preview, F.data == "import_preview:apply", flags={"heavy": True})
+async def handle_import_apply(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    data = await state.get_data()
+    await callback.message.edit_text(LEXICON.IMPORT_APPLYING)
+    await callback.answer()
+
+    result = await orm_apply_staged_import(data.get('import_batch_id'), data.get('import_file_hash'))
+    if not result:
+        await callback.message.answer(LEXICON.IMPORT_STAGED_NOT_FOUND)
+        await state.set_state(None)
+        await _show_admin_panel(callback.message, state, bot)
+        return
+
+    await callback.message.edit_text(_format_admin_report(result))
+    await state.update_data(import_result=result, import_batch_id=None)
+    affected_users = len({line['user_id'] for line in result.get('affected_lines', [])})
+    sent_message = await callback.message.answer(
+        LEXICON.IMPORT_ASK_FOR_NOTIFICATION,
+        reply_markup=get_notify_confirmation_kb(affected_users)
+    )
+    await state.set_state(AdminImportStates.notify_confirmation)
+    await state.update_data(main_message_id=sent_message.message_id)
+
+
+@router.callback_query(AdminImportStates.import_preview, F.data == "import_preview:discard")
+async def handle_import_discard(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    data = await state.get_data()
+    await orm_discard_staged_import(data.get('import_batch_id'))
+    await state.update_data(import_batch_id=None)
+    await state.set_state(None)
+
+    await callback.message.edit_text(LEXICON.IMPORT_CANCELLED)
+    await _show_admin_panel(callback, state, bot)
+    await callback.answer()
+
+
 @router.callback_query(AdminImportStates.notify_confirmation, F.data == "notify_confirm:yes")
 async def handle_notify_yes(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.edit_text(LEXICON.BROADCAST_STARTING)
@@ -263,12 +462,34 @@ async def handle_notify_yes(callback: CallbackQuery, state: FSMContext, bot: Bot
     await state.set_state(None)
     
     if result := data.get('import_result'):
-        asyncio.create_task(broadcast_import_update(bot, result))
+        progress_message = await callback.message.answer(LEXICON.BROADCAST_PROGRESS.format(sent=0, total="...", failed=0))
+        await broadcast_import_update(bot, result, progress_message)
     
     await _show_admin_panel(callback, state, bot)
     await callback.answer()
 
 
+@router.callback_query(AdminImportStates.notify_confirmation, F.data == "notify_confirm:affected")
+async def handle_notify_affected(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    await callback.message.edit_text(LEXICON.BROADCAST_AFFECTED_STARTING)
+    data = await state.get_data()
+    await state.set_state(None)
+
+    result = data.get('import_result') or {}
+    if messages := _format_affected_cart_messages(result.get('affected_lines', [])):
+        admin_kb, user_kb = get_admin_main_kb(), get_user_main_kb()
+        progress_message = await callback.message.answer(
+            LEXICON.BROADCAST_PROGRESS.format(sent=0, total=len(messages), failed=0)
+        )
+        await enqueue_broadcast(
+            [(user_id, text, admin_kb if user_id in ADMIN_IDS else user_kb) for user_id, text in messages],
+            progress_message
+        )
+
+    await _show_admin_panel(callback, state, bot)
+    await callback.answer()
+
+
 @router.callback_query(AdminImportStates.notify_confirmation, F.data == "notify_confirm:no")
 async def handle_notify_no(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.edit_text(LEXICON.BROADCAST_SKIPPED)
@@ -11,21 +11,24 @@ import pandas as pd
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.base import StorageKey
 from aiogram.types import (CallbackQuery, FSInputFile, InlineKeyboardButton,
                            InlineKeyboardMarkup, Message)
 from sqlalchemy.exc import SQLAlchemyError
 
 from config import ADMIN_IDS, ARCHIVES_PATH
 from database.orm import (orm_get_all_collected_items_async,
-                          orm_get_all_products_async,
-                          orm_get_all_temp_list_items_async,
+                          orm_get_data_versions,
                           orm_get_users_with_active_lists,
+                          orm_stream_stock_report_rows,
                           orm_subtract_collected)
 from handlers.admin.core import _show_admin_panel
+from handlers.common import clear_state_keeping_preferences
 from keyboards.inline import get_admin_lock_kb
 from lexicon.lexicon import LEXICON
-from utils.force_save_helper import force_save_user_list
+from utils.broadcast_queue import enqueue_broadcast
+from utils.force_save_helper import force_save_user_lists
+from utils.report_cache import get_cached_report, store_cached_report
+from utils.report_writer import REPORT_FORMATS, write_report
 
 # Налаштовуємо логер
 logger = logging.getLogger(__name__)
@@ -41,43 +44,36 @@ class AdminReportStates(StatesGroup):
     lock_confirmation = State()
 
 
-async def _create_stock_report_async() -> Optional[str]:
+STOCK_REPORT_HEADERS = ("Відділ", "Група", "Назва", "Залишок (кількість)", "Сума залишку (грн)")
+COLLECTED_REPORT_HEADERS = ("Відділ", "Група", "Назва", "Кількість")
+
+
+async def _stock_report_rows():
+    """Перетворює пачки рядків з БД на рядки звіту по залишкам."""
+    async for partition in orm_stream_stock_report_rows():
+        yield [
+            (
+                department, group, name,
+                int(available) if available == int(available) else available,
+                float(available_sum),
+            )
+            for department, group, name, available, available_sum in partition
+        ]
+
+
+async def _collected_report_rows(collected_items: list[dict]):
+    """Віддає рядки зведеного звіту однією пачкою (дані вже агреговані в БД)."""
+    yield [(item["department"], item["group"], item["name"], item["quantity"]) for item in collected_items]
+
+
+def _report_path_base(prefix: str) -> str:
+    os.makedirs(ARCHIVES_PATH, exist_ok=True)
+    return os.path.join(ARCHIVES_PATH, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}")
+
+
+async def _create_stock_report_async(report_format: str = "xlsx") -> Optional[str]:
     try:
-        products = await orm_get_all_products_async()
-        temp_list_items = await orm_get_all_temp_list_items_async()
-        
-        temp_reservations = {}
-        for item in temp_list_items:
-            temp_reservations[item.product_id] = temp_reservations.get(item.product_id, 0) + item.quantity
-
-        report_data = []
-        for product in products:
-            try:
-                stock_qty = float(str(product.кількість).replace(',', '.'))
-            except (ValueError, TypeError):
-                stock_qty = 0
-            
-            reserved = (product.відкладено or 0) + temp_reservations.get(product.id, 0)
-            available = stock_qty - reserved
-            
-            available_sum = available * (product.ціна or 0.0)
-
-            report_data.append({
-                "Відділ": product.відділ,
-                "Група": product.група,
-                "Назва": product.назва,
-                "Залишок (кількість)": int(available) if available == int(available) else available,
-                "Сума залишку (грн)": round(available_sum, 2)
-            })
-            
-        df = pd.DataFrame(report_data)
-        os.makedirs(ARCHIVES_PATH, exist_ok=True)
-        report_path = os.path.join(ARCHIVES_PATH, f"stock_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx")
-        
-        # Використовуємо to_thread для синхронної операції запису файлу
-        await asyncio.to_thread(df.to_excel, report_path, index=False)
-        
-        return report_path
+        return await write_report(_report_path_base("stock_report"), report_format, STOCK_REPORT_HEADERS, _stock_report_rows())
     except Exception as e:
         logger.error("Помилка створення звіту про залишки: %s", e, exc_info=True)
         return None
@@ -110,9 +106,19 @@ def _parse_and_validate_subtract_file(df: pd.DataFrame) -> Optional[pd.DataFrame
 
 async def proceed_with_stock_export(callback: CallbackQuery, bot: Bot, state: FSMContext):
     await callback.answer(LEXICON.EXPORTING_STOCK)
+    report_format = (await state.get_data()).get("report_format", "xlsx")
+    cache_kind = f"stock:{report_format}"
+
+    versions = await orm_get_data_versions()
+    if cached_file_id := await get_cached_report(cache_kind, versions):
+        await callback.message.delete()
+        await bot.send_document(callback.from_user.id, cached_file_id, caption=LEXICON.STOCK_REPORT_CAPTION)
+        await _show_admin_panel(callback, state, bot)
+        return
+
     await callback.message.edit_text("Формую звіт по залишкам...", reply_markup=None)
     
-    report_path = await _create_stock_report_async()
+    report_path = await _create_stock_report_async(report_format)
     
     await callback.message.delete()
 
@@ -120,11 +126,12 @@ async def proceed_with_stock_export(callback: CallbackQuery, bot: Bot, state: FS
         await bot.send_message(callback.from_user.id, LEXICON.STOCK_REPORT_ERROR)
     else:
         try:
-            await bot.send_document(
+            sent_message = await bot.send_document(
                 chat_id=callback.from_user.id,
                 document=FSInputFile(report_path),
                 caption=LEXICON.STOCK_REPORT_CAPTION
             )
+            await store_cached_report(cache_kind, versions, sent_message.document.file_id)
         finally:
             if os.path.exists(report_path): os.remove(report_path)
     
@@ -133,30 +140,35 @@ async def proceed_with_stock_export(callback: CallbackQuery, bot: Bot, state: FS
 
 async def proceed_with_collected_export(callback: CallbackQuery, bot: Bot, state: FSMContext):
     await callback.answer(LEXICON.COLLECTED_REPORT_PROCESSING)
-    await callback.message.edit_text("Формую зведений звіт...", reply_markup=None)
+    report_format = (await state.get_data()).get("report_format", "xlsx")
+    cache_kind = f"collected:{report_format}"
     
     try:
+        versions = await orm_get_data_versions()
+        if cached_file_id := await get_cached_report(cache_kind, versions):
+            await callback.message.delete()
+            await bot.send_document(callback.from_user.id, cached_file_id, caption=LEXICON.COLLECTED_REPORT_CAPTION)
+            await _show_admin_panel(callback, state, bot)
+            return
+
+        await callback.message.edit_text("Формую зведений звіт...", reply_markup=None)
         collected_items = await orm_get_all_collected_items_async()
         await callback.message.delete()
         
         if not collected_items:
             await bot.send_message(callback.from_user.id, LEXICON.COLLECTED_REPORT_EMPTY)
         else:
-            df = pd.DataFrame(collected_items)
-            df.rename(
-                columns={"department": "Відділ", "group": "Група", "name": "Назва", "quantity": "Кількість"},
-                inplace=True
+            report_path = await write_report(
+                _report_path_base("collected_report"), report_format,
+                COLLECTED_REPORT_HEADERS, _collected_report_rows(collected_items)
             )
-            os.makedirs(ARCHIVES_PATH, exist_ok=True)
-            report_path = os.path.join(ARCHIVES_PATH, f"collected_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx")
             
-            await asyncio.to_thread(df.to_excel, report_path, index=False)
-            
-            await bot.send_document(
+            sent_message = await bot.send_document(
                 chat_id=callback.from_user.id,
                 document=FSInputFile(report_path),
                 caption=LEXICON.COLLECTED_REPORT_CAPTION
             )
+            await store_cached_report(cache_kind, versions, sent_message.document.file_id)
             os.remove(report_path)
         
         await _show_admin_panel(callback, state, bot)
@@ -165,7 +177,18 @@ async def proceed_with_collected_export(callback: CallbackQuery, bot: Bot, state
         await bot.send_message(callback.from_user.id, LEXICON.UNEXPECTED_ERROR)
 
 
-@router.callback_query(F.data == "admin:export_stock")
+@router.callback_query(F.data == "admin:report_format")
+async def switch_report_format_handler(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    """Перемикає формат вивантаження звітів по колу: xlsx -> csv -> csv.gz."""
+    current_format = (await state.get_data()).get("report_format", "xlsx")
+    next_index = (REPORT_FORMATS.index(current_format) + 1) % len(REPORT_FORMATS) if current_format in REPORT_FORMATS else 0
+    report_format = REPORT_FORMATS[next_index]
+    await state.update_data(report_format=report_format)
+    await _show_admin_panel(callback, state, bot)
+    await callback.answer(LEXICON.REPORT_FORMAT_CHANGED.format(report_format=report_format))
+
+
+@router.callback_query(F.data == "admin:export_stock", flags={"heavy": True})
 async def export_stock_handler(callback: CallbackQuery, state: FSMContext, bot: Bot):
     active_users = await orm_get_users_with_active_lists()
     if not active_users:
@@ -178,7 +201,7 @@ async def export_stock_handler(callback: CallbackQuery, state: FSMContext, bot:
     await callback.answer("Дію заблоковано", show_alert=True)
 
 
-@router.callback_query(F.data == "admin:export_collected")
+@router.callback_query(F.data == "admin:export_collected", flags={"heavy": True})
 async def export_collected_handler(callback: CallbackQuery, state: FSMContext, bot: Bot):
     active_users = await orm_get_users_with_active_lists()
     if not active_users:
@@ -194,30 +217,28 @@ async def export_collected_handler(callback: CallbackQuery, state: FSMContext, b
 @router.callback_query(AdminReportStates.lock_confirmation, F.data.startswith("lock:notify:"))
 async def handle_report_lock_notify(callback: CallbackQuery, state: FSMContext, bot: Bot):
     data = await state.get_data()
-    for user_id in data.get('locked_user_ids', []):
-        try:
-            await bot.send_message(user_id, LEXICON.USER_SAVE_LIST_NOTIFICATION)
-        except Exception as e:
-            logger.warning("Не вдалося надіслати сповіщення користувачу %s: %s", user_id, e)
+    await enqueue_broadcast([
+        (user_id, LEXICON.USER_SAVE_LIST_NOTIFICATION, None) for user_id in data.get('locked_user_ids', [])
+    ])
     await callback.answer(LEXICON.NOTIFICATIONS_SENT, show_alert=True)
 
 
-@router.callback_query(AdminReportStates.lock_confirmation, F.data.startswith("lock:force_save:"))
+@router.callback_query(AdminReportStates.lock_confirmation, F.data.startswith("lock:force_save:"), flags={"heavy": True})
 async def handle_report_lock_force_save(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.edit_text("Почав примусове збереження списків...")
     data = await state.get_data()
     user_ids, action = data.get('locked_user_ids', []), data.get('action_to_perform')
-    
-    results = []
-    for user_id in user_ids:
-        user_state_key = StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id)
-        user_state = FSMContext(storage=state.storage, key=user_state_key)
-        results.append(await force_save_user_list(user_id, bot, user_state))
-    
-    all_saved_successfully = all(results)
-    
-    if not all_saved_successfully:
-        await callback.message.edit_text("Під час примусового збереження виникли помилки. Спробуйте пізніше.")
+
+    async def report_progress(done: int, total: int, failed: int):
+        await callback.message.edit_text(LEXICON.FORCE_SAVE_PROGRESS.format(done=done, total=total, failed=failed))
+
+    failed_user_ids = await force_save_user_lists(user_ids, bot, state.storage, report_progress)
+
+    if failed_user_ids:
+        await callback.message.edit_text(LEXICON.FORCE_SAVE_FAILED.format(
+            count=len(failed_user_ids), total=len(user_ids),
+            users="\n".join(LEXICON.FORCE_SAVE_FAILED_USER.format(user_id=user_id) for user_id in failed_user_ids)
+        ))
         await state.set_state(None)
         return
     await callback.answer("Всі списки успішно збережено!", show_alert=True)
@@ -242,11 +263,11 @@ async def start_subtract_handler(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(AdminReportStates.waiting_for_subtract_file, F.document)
+@router.message(AdminReportStates.waiting_for_subtract_file, F.document, flags={"heavy": True})
 async def process_subtract_file(message: Message, state: FSMContext, bot: Bot):
     data = await state.get_data()
     await bot.delete_message(message.chat.id, data.get("main_message_id"))
-    await state.clear()
+    await clear_state_keeping_preferences(state)
     
     await message.answer(LEXICON.SUBTRACT_PROCESSING)
     temp_file_path = f"temp_subtract_{message.from_user.id}.tmp"
@@ -18,6 +18,17 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Налаштування користувача, що зберігаються в даних FSM і мають переживати скидання стану
+PERSISTENT_STATE_KEYS = ("report_format",)
+
+
+async def clear_state_keeping_preferences(state: FSMContext):
+    """Скидає стан і дані FSM, зберігаючи налаштування з PERSISTENT_STATE_KEYS."""
+    data = await state.get_data()
+    await state.clear()
+    if preferences := {key: data[key] for key in PERSISTENT_STATE_KEYS if key in data}:
+        await state.set_data(preferences)
+
 
 async def clean_previous_keyboard(state: FSMContext, bot: Bot, chat_id: int):
     """
@@ -12,6 +12,7 @@ from database.engine import async_session
 from database.orm import (orm_add_item_to_temp_list, orm_get_product_by_id,
                           orm_get_temp_list_department,
                           orm_get_total_temp_reservation_for_product)
+from handlers.common import clear_state_keeping_preferences
 from keyboards.inline import get_quantity_selector_kb
 from lexicon.lexicon import LEXICON
 from utils.card_generator import send_or_edit_product_card
@@ -175,7 +176,7 @@ async def process_manual_quantity(message: Message, state: FSMContext, bot: Bot)
     state_data = await state.get_data()
     product_id = state_data.get("product_id")
     original_message_id = state_data.get("message_id")
-    await state.clear()
+    await clear_state_keeping_preferences(state)
     
     # Видаляємо повідомлення користувача з числом
     await message.delete()
@@ -10,6 +10,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from config import ADMIN_IDS
 from database.engine import async_session
+from database.orm import orm_bump_reservation_version
 from keyboards.inline import get_admin_main_kb, get_user_main_kb
 from lexicon.lexicon import LEXICON
 from utils.list_processor import process_and_save_list
@@ -18,7 +19,7 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 
-@router.callback_query(F.data == "save_list")
+@router.callback_query(F.data == "save_list", flags={"heavy": True})
 async def save_list_callback(callback: CallbackQuery, bot: Bot, state: FSMContext):
     """
     Обробляє запит на збереження списку, тепер з коректним керуванням UI.
@@ -33,6 +34,7 @@ async def save_list_callback(callback: CallbackQuery, bot: Bot, state: FSMContex
         async with async_session() as session:
             async with session.begin():
                 main_list_path, surplus_list_path = await process_and_save_list(session, user_id)
+        await orm_bump_reservation_version()
 
         # Видаляємо повідомлення "Зберігаю..."
         await callback.message.delete()
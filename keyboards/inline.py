@@ -56,12 +56,16 @@ def get_admin_main_kb() -> InlineKeyboardMarkup:
         ]
     )
 
-def get_admin_panel_kb() -> InlineKeyboardMarkup:
+def get_admin_panel_kb(report_format: str = "xlsx") -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text=LEXICON.BUTTON_IMPORT_PRODUCTS, callback_data="admin:import_products")],
             [InlineKeyboardButton(text=LEXICON.BUTTON_EXPORT_STOCK, callback_data="admin:export_stock")],
             [InlineKeyboardButton(text=LEXICON.EXPORT_COLLECTED_BUTTON, callback_data="admin:export_collected")],
+            [InlineKeyboardButton(
+                text=LEXICON.BUTTON_REPORT_FORMAT.format(report_format=report_format),
+                callback_data="admin:report_format"
+            )],
             [InlineKeyboardButton(text=LEXICON.BUTTON_SUBTRACT_COLLECTED, callback_data="admin:subtract_collected")],
             [InlineKeyboardButton(text=LEXICON.BUTTON_USER_ARCHIVES, callback_data="admin:user_archives")],
             [InlineKeyboardButton(text=LEXICON.BUTTON_DELETE_ALL_LISTS, callback_data="admin:delete_all_lists")],
@@ -196,34 +200,61 @@ def get_confirmation_kb(confirm_callback: str, cancel_callback: str) -> InlineKe
         ]]
     )
 
-def get_admin_lock_kb(action: str) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[[
-            InlineKeyboardButton(
-                text=LEXICON.BUTTON_NOTIFY_USERS,
-                callback_data=f"lock:notify:{action}"
-            ),
+def get_admin_lock_kb(action: str, allow_proceed: bool = False) -> InlineKeyboardMarkup:
+    keyboard = [[
+        InlineKeyboardButton(
+            text=LEXICON.BUTTON_NOTIFY_USERS,
+            callback_data=f"lock:notify:{action}"
+        ),
+        InlineKeyboardButton(
+            text=LEXICON.BUTTON_FORCE_SAVE,
+            callback_data=f"lock:force_save:{action}"
+        )
+    ]]
+    if allow_proceed:
+        keyboard.append([
             InlineKeyboardButton(
-                text=LEXICON.BUTTON_FORCE_SAVE,
-                callback_data=f"lock:force_save:{action}"
+                text=LEXICON.BUTTON_PROCEED_WITH_ACTIVE_LISTS,
+                callback_data=f"lock:proceed:{action}"
             )
-        ]]
-    )
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_notify_confirmation_kb() -> InlineKeyboardMarkup:
+def get_import_preview_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[[
             InlineKeyboardButton(
-                text=LEXICON.BUTTON_YES_NOTIFY,
-                callback_data="notify_confirm:yes"
+                text=LEXICON.BUTTON_IMPORT_APPLY,
+                callback_data="import_preview:apply"
             ),
             InlineKeyboardButton(
-                text=LEXICON.BUTTON_NO_NOTIFY,
-                callback_data="notify_confirm:no"
+                text=LEXICON.BUTTON_IMPORT_DISCARD,
+                callback_data="import_preview:discard"
             ),
         ]]
     )
 
+
+def get_notify_confirmation_kb(affected_users: int = 0) -> InlineKeyboardMarkup:
+    inline_keyboard = [[
+        InlineKeyboardButton(
+            text=LEXICON.BUTTON_YES_NOTIFY,
+            callback_data="notify_confirm:yes"
+        ),
+        InlineKeyboardButton(
+            text=LEXICON.BUTTON_NO_NOTIFY,
+            callback_data="notify_confirm:no"
+        ),
+    ]]
+    if affected_users:
+        inline_keyboard.append([
+            InlineKeyboardButton(
+                text=LEXICON.BUTTON_NOTIFY_AFFECTED.format(count=affected_users),
+                callback_data="notify_confirm:affected"
+            )
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
 def get_my_list_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
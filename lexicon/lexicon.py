@@ -32,6 +32,7 @@ class Lexicon:
     BUTTON_IMPORT_PRODUCTS = "📥 Імпорт товарів з Excel"
     BUTTON_EXPORT_STOCK = "📊 Вивантажити залишки"
     EXPORT_COLLECTED_BUTTON = "📦 Вивантажити зведення по зібраному"
+    BUTTON_REPORT_FORMAT = "🧾 Формат звітів: {report_format}"
     BUTTON_SUBTRACT_COLLECTED = "📉 Відняти зібране зі складу"
     BUTTON_USER_ARCHIVES = "👥 Архіви користувачів"
     BUTTON_DELETE_ALL_LISTS = "🗑️ Видалити всі списки"
@@ -48,8 +49,10 @@ class Lexicon:
     BUTTON_CONFIRM_NO = "❌ Ні"
     BUTTON_NOTIFY_USERS = "🗣️ Надіслати сповіщення"
     BUTTON_FORCE_SAVE = "💾 Примусово зберегти"
+    BUTTON_PROCEED_WITH_ACTIVE_LISTS = "▶️ Продовжити без збереження списків"
     BUTTON_YES_NOTIFY = "✅ Так, сповістити"
     BUTTON_NO_NOTIFY = "❌ Ні, тихий режим"
+    BUTTON_NOTIFY_AFFECTED = "🎯 Лише тим, чиї списки зачепило ({count})"
     SAVE_LIST_BUTTON = "💾 Зберегти та відкласти"
     CANCEL_LIST_BUTTON = "❌ Скасувати список"
     EDIT_LIST_BUTTON = "✏️ Редагувати"
@@ -110,20 +113,33 @@ class Lexicon:
     REPORT_DEPARTMENT_ITEM = "- Відділ `{dep_id}`: **{count}** арт."
     REPORT_EMPTY_DATA = "Немає даних для формування звіту."
 
-    IMPORT_PROMPT = "Будь ласка, надішліть мені файл Excel (`.xlsx`) з оновленими залишками.\n\nДля скасування натисніть кнопку нижче."
-    IMPORT_WRONG_FORMAT = "❌ Помилка. Будь ласка, надішліть файл у форматі `.xlsx`."
+    IMPORT_PROMPT = "Будь ласка, надішліть мені файл Excel (`.xlsx`) або CSV (`.csv`, `.csv.gz`) з оновленими залишками.\n\nДля скасування натисніть кнопку нижче."
+    IMPORT_WRONG_FORMAT = "❌ Помилка. Будь ласка, надішліть файл у форматі `.xlsx`, `.csv` або `.csv.gz`."
+    IMPORT_XLS_NOT_SUPPORTED = "❌ Старий формат `.xls` не підтримується. Відкрийте файл в Excel і збережіть як `.xlsx` або CSV, після чого надішліть знову."
     IMPORT_PROCESSING = "Завантажую та перевіряю файл..."
     IMPORT_INVALID_COLUMNS = "❌ **Помилка валідації!**\nНазви колонок у файлі неправильні.\nОчікується: `в, г, н, к`.\nУ вашому файлі відсутні: `{columns}`."
-    IMPORT_VALIDATION_ERRORS_TITLE = "❌ **У файлі знайдені помилки валідації:**\n\n"
+    IMPORT_VALIDATION_ERRORS_TITLE = "❌ **У файлі знайдені помилки валідації (зміни не застосовано):**\n\n"
     IMPORT_CRITICAL_READ_ERROR = "❌ Критична помилка при читанні файлу: {error}"
-    IMPORT_STARTING = "Файл виглядає добре. Починаю імпорт та обнулення старих резервів..."
+    IMPORT_STARTING = "Колонки в порядку. Перевіряю рядки та рахую зміни..."
+    IMPORT_APPLYING = "Застосовую імпорт та обнуляю старі резерви..."
+    IMPORT_UNCHANGED_FILE = "⏸️ Цей файл уже імпортовано, і відтоді каталог не змінювався. Імпорт пропущено."
+    IMPORT_UNCHANGED_ROWS = "⏸️ Дані у файлі збігаються з останнім імпортом, і відтоді каталог не змінювався. Імпорт пропущено."
+    IMPORT_STAGED_NOT_FOUND = "❌ Підготовлені дані імпорту не знайдено або вони застаріли. Надішліть файл ще раз."
+    IMPORT_PREVIEW_TITLE = "🔍 *Попередній перегляд імпорту* (зміни ще не застосовано)\n"
+    IMPORT_PREVIEW_FILE_ROWS = "📄 *Унікальних артикулів у файлі:* {total}"
+    IMPORT_PREVIEW_PRICE_TITLE = "\n💰 *Найбільші зміни цін:*"
+    IMPORT_PREVIEW_STOCK_TITLE = "\n📦 *Найбільші зміни залишків:*"
+    IMPORT_PREVIEW_CHANGE_ITEM = "- Відділ `{department}`, `{article}`: {old} → {new}"
+    IMPORT_PREVIEW_WARNINGS_TITLE = "\n⚠️ *Попередження (рядки імпортуються з урахуванням цього):*"
+    IMPORT_PREVIEW_TRUNCATED = "\n_...перелік скорочено_"
     IMPORT_CANCELLED = "Імпорт скасовано."
-    IMPORT_INCORRECT_FILE = "Будь ласка, надішліть документ (файл Excel) або натисніть 'Скасувати'."
+    IMPORT_INCORRECT_FILE = "Будь ласка, надішліть документ (файл Excel або CSV) або натисніть 'Скасувати'."
     IMPORT_SYNC_ERROR = "❌ Сталася критична помилка під час синхронізації з базою даних: {error}"
     
     IMPORT_REPORT_TITLE = "✅ *Синхронізацію завершено!*\n"
     IMPORT_REPORT_ADDED = "➕ *Додано нових:* {added}"
     IMPORT_REPORT_UPDATED = "🔄 *Оновлено існуючих:* {updated}"
+    IMPORT_REPORT_UNCHANGED = "⏸️ *Без змін (пропущено):* {unchanged}"
     IMPORT_REPORT_DEACTIVATED = "➖ *Деактивовано (зникли з файлу):* {deactivated}"
     IMPORT_REPORT_REACTIVATED = "♻️ *Повторно активовано:* {reactivated}\n"
     IMPORT_REPORT_TOTAL = "🗃️ *Всього активних артикулів у базі:* {total}"
@@ -148,6 +164,7 @@ class Lexicon:
     COLLECTED_REPORT_EMPTY = "Наразі немає жодного зібраного товару у збережених списках."
     COLLECTED_REPORT_PROCESSING = "Починаю формування зведеного звіту..."
     STOCK_REPORT_ERROR = "❌ Не вдалося створити звіт про залишки."
+    REPORT_FORMAT_CHANGED = "Формат звітів: {report_format}"
     SUBTRACT_PROMPT = "Будь ласка, надішліть мені звіт по зібраному (`.xlsx`), щоб відняти ці позиції від залишків на складі."
     SUBTRACT_PROCESSING = "Обробляю звіт по зібраному..."
     SUBTRACT_INVALID_COLUMNS = "❌ **Помилка!** Назви колонок у файлі для віднімання неправильні.\nОчікується: `Відділ, Група, Назва, Кількість`.\nУ вашому файлі: `{columns}`."
@@ -162,11 +179,23 @@ class Lexicon:
         "{users_info}\n\n"
         "Оберіть дію:"
     )
-    NOTIFICATIONS_SENT = "✅ Сповіщення успішно надіслано вказаним користувачам."
+    NOTIFICATIONS_SENT = "✅ Сповіщення поставлено в чергу і незабаром надійдуть вказаним користувачам."
+    USER_CART_AFFECTED_TITLE = "⚠️ *Після оновлення бази змінилась наявність товарів у вашому поточному списку:*\n"
+    USER_CART_AFFECTED_DEACTIVATED = "- `{article}`: товар більше не доступний (у списку: {quantity})"
+    USER_CART_AFFECTED_DROPPED = "- `{article}`: доступно {new} замість {old} (у списку: {quantity})"
+    USER_CART_AFFECTED_MORE = "...та ще {count} позицій."
+    FORCE_SAVE_PROGRESS = "⏳ Примусове збереження списків: {done} з {total}, помилок: {failed}..."
+    FORCE_SAVE_FAILED = "❌ Не вдалося примусово зберегти списки {count} з {total} користувачів:\n{users}\n\nСпробуйте пізніше."
+    FORCE_SAVE_FAILED_USER = "- Користувач `{user_id}`"
     USER_SAVE_LIST_NOTIFICATION = "❗️ **Будь ласка, збережіть ваш поточний список!**\nАдміністратор планує оновити базу даних. Незавершені списки можуть бути втрачені або збережені примусово."
     
+    BUTTON_IMPORT_APPLY = "✅ Застосувати"
+    BUTTON_IMPORT_DISCARD = "❌ Скасувати"
     IMPORT_ASK_FOR_NOTIFICATION = "Сповістити всіх користувачів про це оновлення?"
     BROADCAST_STARTING = "✅ Імпорт завершено. Починаю розсилку сповіщень користувачам..."
+    BROADCAST_PROGRESS = "📨 Розсилка: надіслано {sent} з {total}, помилок: {failed}..."
+    BROADCAST_FINISHED = "✅ Розсилку завершено: надіслано {sent} з {total}, помилок: {failed} (з них заблокували бота: {blocked})."
+    BROADCAST_AFFECTED_STARTING = "✅ Імпорт завершено. Сповіщаю лише користувачів, чиї списки зачепило оновлення..."
     BROADCAST_SKIPPED = "✅ Імпорт завершено. Сповіщення користувачам не надсилались ('тихий режим')."
     
     # --- ОНОВЛЕНИЙ ШАБЛОН СПОВІЩЕННЯ (З ЖИРНИМ ШРИФТОМ) ---
@@ -185,6 +214,9 @@ class Lexicon:
 
     DELETE_WARNING_MESSAGE = "❗️ **Увага!**\n\nВаші збережені списки, старші за 36 годин, будуть видалені через 12 годин. Якщо ви хочете зберегти їх, будь ласка, завантажте ZIP-архів зі свого архіву."
     
+    TASK_QUEUED = "⏳ Бот зараз зайнятий іншими запитами. Ваш запит у черзі (позиція {position}), він виконається автоматично."
+    TASK_REJECTED_BUSY = "😔 Бот зараз перевантажений. Будь ласка, спробуйте ще раз за хвилину."
+
     UNEXPECTED_ERROR = (
         "😔 **Ой, щось пішло не так...**\n"
         "Виникла непередбачена помилка. Ми вже отримали сповіщення і працюємо над її вирішенням. Спробуйте повторити дію пізніше."
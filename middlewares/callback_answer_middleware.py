@@ -0,0 +1,37 @@
+# epicservice/middlewares/callback_answer_middleware.py
+
+import logging
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (BaseRequestMiddleware,
+                                                     NextRequestMiddlewareType)
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+# Помилки Telegram, коли на callback-запит уже відповіли або він протермінувався
+EXPIRED_QUERY_MARKERS = ("query is too old", "query id is invalid")
+
+
+class IgnoreExpiredCallbackAnswers(BaseRequestMiddleware):
+    """
+    Middleware сесії бота: пізня відповідь на callback-запит не вважається помилкою.
+
+    Важка дія, що довго чекала в черзі, вже отримала відповідь «у черзі», тож її
+    власний `callback.answer(...)` у кінці не повинен перетворювати успішну дію на збій.
+    """
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        try:
+            return await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if isinstance(method, AnswerCallbackQuery) and any(marker in e.message.lower() for marker in EXPIRED_QUERY_MARKERS):
+                logger.info("Відповідь на протермінований callback-запит пропущено: %s", e.message)
+                return Response[TelegramType](ok=True, result=True)
+            raise
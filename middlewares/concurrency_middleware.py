@@ -0,0 +1,146 @@
+# epicservice/middlewares/concurrency_middleware.py
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config import (HEAVY_CONCURRENCY, HEAVY_QUEUE_LIMIT,
+                    INTERACTIVE_CONCURRENCY)
+from lexicon.lexicon import LEXICON
+
+logger = logging.getLogger(__name__)
+
+# Як часто (секунд) писати в лог підсумкові метрики черг
+METRICS_INTERVAL = 60.0
+
+
+class _Lane:
+    """Смуга виконання: обмеження одночасних обробників, черга очікування та її метрики."""
+
+    def __init__(self, name: str, limit: int, queue_limit: Optional[int] = None):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.queued = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+
+    @property
+    def is_full(self) -> bool:
+        return self.semaphore.locked()
+
+    @property
+    def queue_is_full(self) -> bool:
+        return self.queue_limit is not None and self.waiting >= self.queue_limit
+
+    def metrics(self) -> str:
+        return (
+            f"{self.name}: виконується {self.running}/{self.limit}, у черзі {self.waiting}, "
+            f"завершено {self.completed}, чекали {self.queued}, відхилено {self.rejected}, "
+            f"найдовше очікування {self.max_wait:.1f} с"
+        )
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    """
+    Обмежує кількість обробників, що виконуються одночасно.
+
+    Обробники з прапорцем `heavy` (збереження, імпорт, звіти, архіви) мають окремий
+    малий ліміт, тож сплеск збережень не забирає пул з'єднань і процесор у решти.
+    Поки важка дія чекає в черзі, користувач отримує відповідь на кнопку (або тимчасове
+    повідомлення) з позицією, а коли черга переповнена — прохання спробувати пізніше. Ліміти діють у межах процесу.
+    Реєструється як внутрішній middleware для message та callback_query.
+    """
+
+    def __init__(self):
+        self.interactive = _Lane("interactive", INTERACTIVE_CONCURRENCY)
+        self.heavy = _Lane("heavy", HEAVY_CONCURRENCY, HEAVY_QUEUE_LIMIT)
+        self._last_metrics = time.monotonic()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        lane = self.heavy if get_flag(data, "heavy") else self.interactive
+        if lane.queue_is_full:
+            lane.rejected += 1
+            logger.warning("Черга '%s' переповнена, дію відхилено. %s", lane.name, lane.metrics())
+            await self._notify_busy(event)
+            return None
+
+        queued_message = None
+        started_waiting = time.monotonic()
+        was_queued = lane.is_full
+        if was_queued:
+            lane.queued += 1
+            if lane is self.heavy:
+                queued_message = await self._notify_queued(event, data.get("bot"), lane.waiting + 1)
+
+        lane.waiting += 1
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+
+        waited = time.monotonic() - started_waiting
+        lane.max_wait = max(lane.max_wait, waited)
+        if was_queued and lane is self.heavy:
+            logger.info("Дія з черги '%s' стартувала після %.1f с очікування.", lane.name, waited)
+        if queued_message is not None:
+            try:
+                await queued_message.delete()
+            except Exception:
+                pass
+
+        lane.running += 1
+        try:
+            return await handler(event, data)
+        finally:
+            lane.running -= 1
+            lane.completed += 1
+            lane.semaphore.release()
+            self._log_metrics()
+
+    @staticmethod
+    async def _notify_queued(event: TelegramObject, bot: Optional[Bot], position: int) -> Optional[Message]:
+        """
+        Повідомляє про чергу. Callback-запит відповідаємо одразу: за довге очікування
+        він протермінується, а власну пізню відповідь обробника поглине
+        `IgnoreExpiredCallbackAnswers`. На повідомлення — тимчасове повідомлення.
+        """
+        text = LEXICON.TASK_QUEUED.format(position=position)
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text)
+                return None
+            return await bot.send_message(event.chat.id, text)
+        except Exception as e:
+            logger.warning("Не вдалося повідомити про чергу: %s", e)
+            return None
+
+    @staticmethod
+    async def _notify_busy(event: TelegramObject):
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(LEXICON.TASK_REJECTED_BUSY, show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer(LEXICON.TASK_REJECTED_BUSY)
+        except Exception as e:
+            logger.warning("Не вдалося повідомити про перевантаження: %s", e)
+
+    def _log_metrics(self):
+        now = time.monotonic()
+        if now - self._last_metrics >= METRICS_INTERVAL:
+            self._last_metrics = now
+            logger.info("Навантаження обробників — %s; %s", self.interactive.metrics(), self.heavy.metrics())
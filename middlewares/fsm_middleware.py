@@ -0,0 +1,125 @@
+# epicservice/middlewares/fsm_middleware.py
+
+import logging
+from copy import copy, deepcopy
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+_NOT_LOADED = object()
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext, що працює як unit of work у межах одного оновлення.
+
+    Стан і дані читаються зі сховища не більше одного разу, усі зміни накопичуються
+    в пам'яті й записуються одним `flush()` після завершення обробника. Дані пишуться
+    не знімком, а різницею: змінені й видалені ключі накладаються на свіжі дані
+    сховища, тож паралельні оновлення того самого користувача (довгий імпорт чи
+    збереження поруч зі звичайними кнопками) не затирають ключі одне одного.
+    """
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, raw_state: Any = _NOT_LOADED):
+        super().__init__(storage=storage, key=key)
+        self._state = raw_state
+        self._state_changed = False
+        # Дані на момент читання (глибока копія) і робоча копія, яку змінює обробник
+        self._loaded: Optional[Dict[str, Any]] = None
+        self._data: Optional[Dict[str, Any]] = None
+        # clear() свідомо стирає всі дані, тож тоді пишемо повну заміну, а не різницю
+        self._cleared = False
+
+    async def _load_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            self._loaded = deepcopy(self._data)
+        return self._data
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def get_state(self) -> Optional[str]:
+        if self._state is _NOT_LOADED:
+            self._state = await self.storage.get_state(key=self.key)
+        return self._state
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        await self._load_data()
+        self._data = copy(data)
+
+    async def get_data(self) -> Dict[str, Any]:
+        return copy(await self._load_data())
+
+    async def get_value(self, key: str, default: Optional[Any] = None) -> Any:
+        return (await self._load_data()).get(key, default)
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        current = await self._load_data()
+        if data:
+            current.update(data)
+        current.update(kwargs)
+        return copy(current)
+
+    async def clear(self) -> None:
+        await self.set_state(None)
+        self._data, self._cleared = {}, True
+
+    async def flush(self) -> None:
+        """Записує у сховище накопичені зміни (лише те, що справді змінювалось)."""
+        if self._state_changed:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._state_changed = False
+        if self._data is None:
+            return
+        if self._cleared:
+            await self.storage.set_data(key=self.key, data=self._data)
+        else:
+            changed = {
+                name: value for name, value in self._data.items()
+                if name not in self._loaded or self._loaded[name] != value
+            }
+            deleted = self._loaded.keys() - self._data.keys()
+            if changed or deleted:
+                fresh = await self.storage.get_data(key=self.key)
+                fresh.update(changed)
+                for name in deleted:
+                    fresh.pop(name, None)
+                await self.storage.set_data(key=self.key, data=fresh)
+        self._loaded, self._cleared = deepcopy(self._data), False
+
+
+class FSMUnitOfWorkMiddleware(BaseMiddleware):
+    """
+    Middleware, що підміняє `state` обробника на `BufferedFSMContext`.
+
+    Реєструється як внутрішній middleware `dp.update`, тобто після вбудованого
+    FSM-middleware aiogram: бере його ключ і вже прочитаний `raw_state`, а зміни
+    записує один раз — навіть якщо обробник завершився помилкою.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        state: Optional[FSMContext] = data.get("state")
+        if state is None:
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(state.storage, state.key, data.get("raw_state", _NOT_LOADED))
+        data["state"] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            try:
+                await buffered.flush()
+            except Exception as e:
+                logger.error("Не вдалося зберегти стан FSM для ключа %s: %s", buffered.key, e, exc_info=True)
@@ -0,0 +1,112 @@
+# epicservice/utils/broadcast_queue.py
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from config import BROADCAST_RATE
+from database.orm import (orm_claim_broadcast_recipients,
+                          orm_create_broadcast_job,
+                          orm_fail_interrupted_broadcasts,
+                          orm_get_broadcast_progress,
+                          orm_set_broadcast_statuses)
+from lexicon.lexicon import LEXICON
+from utils.broadcaster import BroadcastMessage, broadcast
+
+logger = logging.getLogger(__name__)
+
+# Скільки повідомлень обробник забирає з черги за раз (приблизно дві секунди розсилки)
+CLAIM_BATCH_SIZE = BROADCAST_RATE * 2
+# Як часто перевіряти чергу, якщо нових розсилок у цьому процесі не ставили
+IDLE_POLL_SECONDS = 5
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _get_wakeup_event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def enqueue_broadcast(messages: Iterable[BroadcastMessage], progress_message: Optional[Message] = None) -> int:
+    """
+    Ставить розсилку в чергу в БД і будить фоновий обробник. Повертає id розсилки.
+
+    Розсилка переживає перезапуск бота; `progress_message` (повідомлення адміністратора)
+    оновлюватиметься з прогресом надсилання.
+    """
+    job_id = await orm_create_broadcast_job(
+        [
+            (chat_id, text, reply_markup.model_dump_json(exclude_none=True) if reply_markup else None)
+            for chat_id, text, reply_markup in messages
+        ],
+        progress_chat_id=progress_message.chat.id if progress_message else None,
+        progress_message_id=progress_message.message_id if progress_message else None,
+    )
+    _get_wakeup_event().set()
+    return job_id
+
+
+async def _report_progress(bot: Bot, job_ids: set[int]):
+    for job in (await orm_get_broadcast_progress(list(job_ids))).values():
+        if not job["chat_id"] or not job["message_id"]:
+            continue
+        total = sum(job[status] for status in ("pending", "sending", "sent", "failed", "blocked"))
+        finished = not job["pending"] and not job["sending"]
+        template = LEXICON.BROADCAST_FINISHED if finished else LEXICON.BROADCAST_PROGRESS
+        try:
+            await bot.edit_message_text(
+                template.format(
+                    sent=job["sent"], total=total, failed=job["failed"] + job["blocked"], blocked=job["blocked"]
+                ),
+                chat_id=job["chat_id"], message_id=job["message_id"]
+            )
+        except TelegramAPIError as e:
+            logger.debug("Не вдалося оновити прогрес розсилки: %s", e)
+
+
+async def run_broadcast_worker(bot: Bot):
+    """
+    Фоновий обробник черги розсилок: забирає повідомлення пачками, надсилає їх
+    через `broadcast` і записує результат. Працює, доки задачу не скасують.
+    """
+    interrupted = await orm_fail_interrupted_broadcasts()
+    if interrupted:
+        logger.warning("Розсилки: %s повідомлень перервано перезапуском, повторно не надсилаються.", interrupted)
+
+    wakeup = _get_wakeup_event()
+    while True:
+        try:
+            claimed = await orm_claim_broadcast_recipients(CLAIM_BATCH_SIZE)
+            if not claimed:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            messages = [
+                (row.user_id, row.text,
+                 InlineKeyboardMarkup.model_validate_json(row.reply_markup) if row.reply_markup else None)
+                for row in claimed
+            ]
+            result = await broadcast(bot, messages)
+
+            statuses: dict[str, list[int]] = {}
+            for index, row in enumerate(claimed):
+                statuses.setdefault(result.outcomes.get(index, "failed"), []).append(row.id)
+            await orm_set_broadcast_statuses(statuses)
+            await _report_progress(bot, {row.job_id for row in claimed})
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Помилка обробника черги розсилок: %s", e, exc_info=True)
+            await asyncio.sleep(IDLE_POLL_SECONDS)
@@ -0,0 +1,160 @@
+# epicservice/utils/broadcaster.py
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (TelegramAPIError, TelegramForbiddenError,
+                                TelegramRetryAfter)
+from aiogram.types import InlineKeyboardMarkup
+
+from config import BROADCAST_CONCURRENCY, BROADCAST_RATE
+from database.orm import orm_mark_users_blocked
+
+logger = logging.getLogger(__name__)
+
+# Telegram дозволяє не більше одного повідомлення на секунду в один чат
+PER_CHAT_INTERVAL = 1.0
+# Скільки разів повторювати надсилання після RetryAfter
+MAX_SEND_ATTEMPTS = 3
+# Як часто (у секундах) повідомляти про прогрес
+PROGRESS_INTERVAL = 3.0
+
+# Одне повідомлення розсилки: (chat_id, текст, клавіатура)
+BroadcastMessage = tuple[int, str, Optional[InlineKeyboardMarkup]]
+
+# Результат надсилання одного повідомлення
+SEND_SENT, SEND_FAILED, SEND_BLOCKED = "sent", "failed", "blocked"
+
+
+@dataclass
+class BroadcastResult:
+    """Підсумок розсилки."""
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: list[int] = field(default_factory=list)
+    # Результат кожного повідомлення за його позицією у вхідному списку
+    outcomes: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+
+class TokenBucket:
+    """Маркерний кошик: у середньому не більше `rate` надсилань на секунду."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Зупиняє видачу маркерів на `seconds` (після RetryAfter від Telegram)."""
+        self._tokens = 0.0
+        self._updated = max(self._updated, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._updated:
+                    await asyncio.sleep(self._updated - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Ліміти Telegram спільні для всього бота, тож кошик і черговість чатів — спільні для всіх розсилок
+_bucket = TokenBucket(BROADCAST_RATE)
+_chat_slots: dict[int, float] = {}
+
+
+async def _send(bot: Bot, message: BroadcastMessage) -> str:
+    chat_id, text, reply_markup = message
+    for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+        # Повідомлення в той самий чат розводимо щонайменше на PER_CHAT_INTERVAL
+        now = time.monotonic()
+        if len(_chat_slots) > 10000:
+            for stale_chat_id in [key for key, value in _chat_slots.items() if value < now]:
+                del _chat_slots[stale_chat_id]
+        slot = max(now, _chat_slots.get(chat_id, 0.0))
+        _chat_slots[chat_id] = slot + PER_CHAT_INTERVAL
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        await _bucket.acquire()
+        try:
+            await bot.send_message(chat_id, text, reply_markup=reply_markup)
+            return SEND_SENT
+        except TelegramRetryAfter as e:
+            logger.warning("Розсилка: Telegram просить зачекати %s с (спроба %s).", e.retry_after, attempt)
+            _bucket.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return SEND_BLOCKED
+        except TelegramAPIError as e:
+            logger.warning("Не вдалося надіслати повідомлення користувачу %s: %s", chat_id, e)
+            return SEND_FAILED
+    return SEND_FAILED
+
+
+async def broadcast(
+    bot: Bot,
+    messages: Iterable[BroadcastMessage],
+    on_progress: Optional[Callable[[BroadcastResult], Awaitable[None]]] = None,
+) -> BroadcastResult:
+    """
+    Надсилає повідомлення паралельно (до BROADCAST_CONCURRENCY одночасно) з обмеженням
+    швидкості BROADCAST_RATE повідомлень на секунду.
+
+    RetryAfter призупиняє всю розсилку на вказаний час і повторює надсилання,
+    користувачі, що заблокували бота, позначаються в базі й надалі не отримують розсилок.
+    `on_progress` викликається не частіше ніж раз на PROGRESS_INTERVAL секунд і наприкінці.
+    """
+    queue = list(messages)
+    result = BroadcastResult(total=len(queue))
+    pending = iter(enumerate(queue))
+    last_progress = time.monotonic()
+
+    async def report_progress(force: bool = False):
+        nonlocal last_progress
+        if on_progress is None or (not force and time.monotonic() - last_progress < PROGRESS_INTERVAL):
+            return
+        last_progress = time.monotonic()
+        try:
+            await on_progress(result)
+        except Exception as e:
+            logger.warning("Не вдалося оновити прогрес розсилки: %s", e)
+
+    async def worker():
+        for index, message in pending:
+            outcome = await _send(bot, message)
+            result.outcomes[index] = outcome
+            if outcome == SEND_SENT:
+                result.sent += 1
+            else:
+                result.failed += 1
+                if outcome == SEND_BLOCKED:
+                    result.blocked.append(message[0])
+            await report_progress()
+
+    await asyncio.gather(*(worker() for _ in range(min(BROADCAST_CONCURRENCY, len(queue)))))
+
+    if result.blocked:
+        await orm_mark_users_blocked(result.blocked)
+    await report_progress(force=True)
+    logger.debug(
+        "Розсилку завершено: надіслано %s/%s, помилок %s, заблокували бота %s.",
+        result.sent, result.total, result.failed, len(result.blocked)
+    )
+    return result
@@ -1,15 +1,20 @@
 # epicservice/utils/force_save_helper.py
 
+import asyncio
 import logging
 import os
+import time
+from typing import Awaitable, Callable, Optional
 
 from aiogram import Bot
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from aiogram.types import FSInputFile
 from sqlalchemy.exc import SQLAlchemyError
 
-from config import ADMIN_IDS
+from config import ADMIN_IDS, FORCE_SAVE_CONCURRENCY
 from database.engine import async_session
+from database.orm import orm_bump_reservation_version
 from handlers.common import clean_previous_keyboard
 from keyboards.inline import get_admin_main_kb, get_user_main_kb
 from lexicon.lexicon import LEXICON
@@ -17,6 +22,9 @@ from utils.list_processor import process_and_save_list
 
 logger = logging.getLogger(__name__)
 
+# Як часто (у секундах) оновлювати прогрес пакетного збереження
+PROGRESS_INTERVAL = 2.0
+
 
 async def force_save_user_list(user_id: int, bot: Bot, state: FSMContext) -> bool:
     """
@@ -33,6 +41,7 @@ async def force_save_user_list(user_id: int, bot: Bot, state: FSMContext) -> boo
         async with async_session() as session:
             async with session.begin():
                 main_list_path, surplus_list_path = await process_and_save_list(session, user_id)
+        await orm_bump_reservation_version()
 
         # Прибираємо клавіатуру з попереднього головного меню користувача
         await clean_previous_keyboard(user_state, bot, user_id)
@@ -72,4 +81,40 @@ async def force_save_user_list(user_id: int, bot: Bot, state: FSMContext) -> boo
         if main_list_path and os.path.exists(main_list_path):
             os.remove(main_list_path)
         if surplus_list_path and os.path.exists(surplus_list_path):
-            os.remove(surplus_list_path)
\ No newline at end of file
+            os.remove(surplus_list_path)
+
+
+async def force_save_user_lists(
+    user_ids: list[int],
+    bot: Bot,
+    storage: BaseStorage,
+    on_progress: Optional[Callable[[int, int, int], Awaitable[None]]] = None,
+) -> list[int]:
+    """
+    Примусово зберігає списки кількох користувачів паралельно (до FORCE_SAVE_CONCURRENCY одночасно).
+
+    `on_progress(збережено, всього, помилок)` викликається не частіше ніж раз на
+    PROGRESS_INTERVAL секунд і після останнього користувача. Повертає ID користувачів,
+    чиї списки зберегти не вдалося.
+    """
+    semaphore = asyncio.Semaphore(FORCE_SAVE_CONCURRENCY)
+    failed_user_ids: list[int] = []
+    done_count, last_progress = 0, 0.0
+
+    async def save_one(user_id: int):
+        nonlocal done_count, last_progress
+        async with semaphore:
+            user_state = FSMContext(storage=storage, key=StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id))
+            if not await force_save_user_list(user_id, bot, user_state):
+                failed_user_ids.append(user_id)
+        done_count += 1
+
+        if on_progress and (done_count == len(user_ids) or time.monotonic() - last_progress >= PROGRESS_INTERVAL):
+            last_progress = time.monotonic()
+            try:
+                await on_progress(done_count, len(user_ids), len(failed_user_ids))
+            except Exception as e:
+                logger.warning("Не вдалося оновити прогрес примусового збереження: %s", e)
+
+    await asyncio.gather(*(save_one(user_id) for user_id in user_ids))
+    return failed_user_ids
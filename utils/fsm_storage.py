@@ -0,0 +1,238 @@
+# epicservice/utils/fsm_storage.py
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import asyncpg
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, FSM_CACHE_SIZE
+from database.engine import async_session
+from database.models import FSMRecord
+
+logger = logging.getLogger(__name__)
+
+# Зміни, зроблені протягом цього часу, записуються в БД одним запитом
+FLUSH_INTERVAL = 0.5
+# Скільки секунд запис кешу вважається актуальним. Зміни з інших процесів приходять
+# через NOTIFY; TTL — запобіжник на випадок, коли сповіщення загубилось
+CACHE_TTL = 60.0
+# Канал сповіщень про змінені ключі та скільки ключів передається в одному сповіщенні
+# (payload NOTIFY обмежений 8000 байтами)
+INVALIDATION_CHANNEL = "fsm_records_changed"
+NOTIFY_KEYS_PER_MESSAGE = 100
+# Пауза між спробами перепідключити слухача сповіщень
+LISTENER_RETRY_INTERVAL = 30.0
+
+
+@dataclass
+class _CachedRecord:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM-сховище aiogram у таблиці `fsm_records` з LRU-кешем у пам'яті процесу.
+
+    Читання йдуть з кешу (при промаху — один запит до БД), записи одразу змінюють кеш,
+    а в БД потрапляють пачкою не пізніше ніж через FLUSH_INTERVAL. Змінені ключі, а також
+    ті, що саме записуються, з кешу не витісняються й не перечитуються, доки запис не
+    підтверджено комітом. Стан переживає перезапуск бота.
+
+    Кожен запис у БД супроводжується NOTIFY зі зміненими ключами, а кожен процес
+    слухає канал і викидає ці ключі зі свого кешу. Так зміни стану чужого користувача
+    (примусове збереження з процесу адміністратора) одразу видно процесу, що його
+    обслуговує. Якщо в процесі-власнику на той момент є ще не записана зміна того ж
+    ключа (вікно до FLUSH_INTERVAL), перемагає вона.
+    """
+
+    def __init__(self, cache_size: int = FSM_CACHE_SIZE):
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, _CachedRecord]" = OrderedDict()
+        self._dirty: set[str] = set()
+        # Ключі, які зараз записує flush(): до коміту в БД ще лежить старий рядок
+        self._in_flight: set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        # Позначка цього процесу: власні сповіщення слухач пропускає
+        self._origin = uuid.uuid4().hex
+        self._listener: Optional[asyncpg.Connection] = None
+        self._listener_retry_at = 0.0
+
+    @staticmethod
+    def _record_key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+        ))
+
+    def _is_pinned(self, record_key: str) -> bool:
+        """Кеш ключа новіший за БД: його не можна ні витісняти, ні перечитувати."""
+        return record_key in self._dirty or record_key in self._in_flight
+
+    async def _ensure_listener(self):
+        """Підключає слухача сповіщень про зміни з інших процесів (або перепідключає після розриву)."""
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        if time.monotonic() < self._listener_retry_at:
+            return
+        try:
+            connection = await asyncpg.connect(
+                host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, database=DB_NAME
+            )
+            await connection.add_listener(INVALIDATION_CHANNEL, self._on_invalidation)
+        except Exception as e:
+            self._listener_retry_at = time.monotonic() + LISTENER_RETRY_INTERVAL
+            logger.warning("Не вдалося підписатися на зміни FSM, кеш оновлюватиметься за TTL: %s", e)
+            return
+        reconnected = self._listener is not None
+        self._listener = connection
+        if reconnected:
+            # Поки слухача не було, сповіщення могли загубитися
+            for record_key in [k for k in self._cache if not self._is_pinned(k)]:
+                del self._cache[record_key]
+
+    def _on_invalidation(self, connection, pid, channel, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self._origin:
+            return
+        for record_key in message.get("keys", []):
+            if not self._is_pinned(record_key):
+                self._cache.pop(record_key, None)
+
+    async def _get_record(self, key: StorageKey) -> tuple[str, _CachedRecord]:
+        await self._ensure_listener()
+        record_key = self._record_key(key)
+        record = self._cache.get(record_key)
+        if record is not None and (self._is_pinned(record_key) or time.monotonic() - record.loaded_at < CACHE_TTL):
+            self._cache.move_to_end(record_key)
+            return record_key, record
+
+        async with async_session() as session:
+            row = (await session.execute(
+                select(FSMRecord.state, FSMRecord.data).where(FSMRecord.key == record_key)
+            )).one_or_none()
+        # Поки чекали на БД, ключ могли змінити в цьому ж процесі — тоді кеш новіший
+        if self._is_pinned(record_key):
+            return record_key, self._cache[record_key]
+
+        record = _CachedRecord(state=row.state, data=row.data or {}) if row else _CachedRecord()
+        self._cache[record_key] = record
+        self._cache.move_to_end(record_key)
+        self._evict()
+        return record_key, record
+
+    def _evict(self):
+        if len(self._cache) <= self._cache_size:
+            return
+        for record_key in list(self._cache):
+            if len(self._cache) <= self._cache_size:
+                break
+            if not self._is_pinned(record_key):
+                del self._cache[record_key]
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    def _mark_dirty(self, record_key: str, record: _CachedRecord):
+        # Щойно записане значення актуальне: TTL відраховується від останнього запису
+        record.loaded_at = time.monotonic()
+        self._dirty.add(record_key)
+        self._schedule_flush()
+
+    async def _flush_later(self):
+        await asyncio.sleep(FLUSH_INTERVAL)
+        # Записи, зроблені під час flush(), мають запланувати новий прохід
+        self._flush_task = None
+        if not await self.flush():
+            self._schedule_flush()
+
+    async def flush(self) -> bool:
+        """
+        Записує в БД усі змінені ключі: непорожні — одним upsert, порожні — видаляє.
+        Повертає False, якщо запис не вдався (ключі лишаються зміненими до наступної спроби).
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return True
+            self._in_flight, self._dirty = self._dirty, set()
+            rows, empty_keys = [], []
+            for record_key in self._in_flight:
+                record = self._cache[record_key]
+                if record.state is None and not record.data:
+                    empty_keys.append(record_key)
+                else:
+                    rows.append({"key": record_key, "state": record.state, "data": record.data})
+            try:
+                async with async_session() as session:
+                    async with session.begin():
+                        if rows:
+                            stmt = insert(FSMRecord).values(rows)
+                            await session.execute(stmt.on_conflict_do_update(
+                                index_elements=[FSMRecord.key],
+                                set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": func.now()}
+                            ))
+                        if empty_keys:
+                            await session.execute(delete(FSMRecord).where(FSMRecord.key.in_(empty_keys)))
+                        # Сповіщення доставляються лише після коміту
+                        changed_keys = sorted(self._in_flight)
+                        for start in range(0, len(changed_keys), NOTIFY_KEYS_PER_MESSAGE):
+                            payload = json.dumps({
+                                "origin": self._origin,
+                                "keys": changed_keys[start:start + NOTIFY_KEYS_PER_MESSAGE],
+                            })
+                            await session.execute(select(func.pg_notify(INVALIDATION_CHANNEL, payload)))
+            except Exception as e:
+                logger.error("Не вдалося записати стан FSM (%s ключів), повторю пізніше: %s", len(self._in_flight), e)
+                # Ключі в польоті не витіснялись, тож їхні записи досі в кеші
+                self._dirty |= self._in_flight
+                return False
+            except asyncio.CancelledError:
+                # Перерваний запис (зупинка бота) не підтверджено — ключі знову чекають запису
+                self._dirty |= self._in_flight
+                raise
+            finally:
+                self._in_flight = set()
+            return True
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record_key, record = await self._get_record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(record_key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._get_record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record_key, record = await self._get_record(key)
+        record.data = copy(data)
+        self._mark_dirty(record_key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, record = await self._get_record(key)
+        return copy(record.data)
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            # Дочікуємося, поки скасований запис поверне свої ключі в _dirty
+            await asyncio.wait([self._flush_task])
+        await self.flush()
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
@@ -0,0 +1,99 @@
+# epicservice/utils/import_parser.py
+
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Відповідність коротких назв колонок у файлі постачальника полям товару
+IMPORT_COLUMN_MAPPING = {
+    "в": "відділ", "г": "група", "н": "назва", "к": "кількість",
+    "м": "місяці_без_руху", "с": "сума_залишку", "ц": "ціна"
+}
+REQUIRED_IMPORT_COLUMNS = {"в", "г", "н", "к"}
+
+
+class ImportValidationError(Exception):
+    """Файл імпорту містить помилки; `errors` — повідомлення для адміністратора."""
+
+    def __init__(self, errors: list[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class ImportReadError(Exception):
+    """Файл імпорту не вдалося прочитати (пошкоджений, непідтримуваний формат тощо)."""
+
+ARTICLE_PATTERN = r"^(\d{8,})"
+
+
+def clean_numeric_text(series: pd.Series) -> pd.Series:
+    """Векторний аналог очищення рядка: кома -> крапка, лишаються тільки цифри, '.' та '-'."""
+    cleaned = (
+        series.astype(str)
+        .str.replace(',', '.', regex=False)
+        .str.strip()
+        .str.replace(r'[^0-9.-]', '', regex=True)
+    )
+    return cleaned.where(series.notna())
+
+
+def _to_text(series: pd.Series) -> pd.Series:
+    """Приводить текстову колонку до рядків без пробілів по краях; порожні клітинки стають ""."""
+    return series.fillna("").astype(str).str.strip()
+
+
+def _to_float(series: pd.Series) -> pd.Series:
+    """Приводить колонку до float; порожні та нечислові значення стають 0.0."""
+    return pd.to_numeric(clean_numeric_text(series), errors='coerce').fillna(0.0).astype(float)
+
+
+def parse_import_dataframe(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Нормалізує DataFrame постачальника колонковими операціями.
+
+    Повертає по одному рядку на артикул (при дублікатах перемагає останній рядок файлу)
+    з колонками: артикул, назва, відділ, група, кількість (рядок), кількість_число,
+    місяці_без_руху (None, якщо колонки немає у файлі), сума_залишку, ціна, а також
+    `рядок` — індекс вихідного рядка, за яким дублікати розв'язуються між пачками.
+    """
+    df = dataframe.rename(columns=lambda c: IMPORT_COLUMN_MAPPING.get(str(c).lower(), c))
+    df = df[df["назва"].notna()]
+
+    names = _to_text(df["назва"])
+    articles = names.str.extract(ARTICLE_PATTERN, expand=False)
+    # Значення можуть бути рядками ("12" чи "12.0"), тому спершу приводимо до числа.
+    # Рядки з нечисловим відділом відкидаються тут, а про помилку повідомляє валідація
+    departments = pd.to_numeric(df["відділ"], errors='coerce')
+    keep = articles.notna() & departments.notna()
+    df, names, articles, departments = df[keep], names[keep], articles[keep], departments[keep]
+
+    empty_column = pd.Series(0.0, index=df.index)
+    quantity_text = clean_numeric_text(df["кількість"]).fillna("0")
+    quantity = pd.to_numeric(quantity_text, errors='coerce').fillna(0.0).astype(float)
+    stock_sum = _to_float(df["сума_залишку"]) if "сума_залишку" in df.columns else empty_column
+    price = _to_float(df["ціна"]) if "ціна" in df.columns else empty_column
+
+    # Якщо ціна не вказана, відновлюємо її з суми залишку
+    derive_price = (price == 0.0) & (quantity > 0)
+    price = price.where(~derive_price, stock_sum / quantity.where(quantity > 0))
+
+    if "місяці_без_руху" in df.columns:
+        months = _to_float(df["місяці_без_руху"]).astype(int).astype(object)
+    else:
+        months = pd.Series(None, index=df.index, dtype=object)
+
+    parsed = pd.DataFrame({
+        "рядок": df.index,
+        "артикул": articles,
+        "назва": names,
+        "відділ": departments.astype("int64"),
+        "група": _to_text(df["група"]) if "група" in df.columns else "",
+        "кількість": quantity_text,
+        "кількість_число": quantity,
+        "місяці_без_руху": months,
+        "сума_залишку": quantity * price,
+        "ціна": price,
+    })
+    return parsed.drop_duplicates(subset="артикул", keep="last").reset_index(drop=True)
@@ -0,0 +1,93 @@
+# epicservice/utils/import_pool.py
+
+import logging
+import multiprocessing
+import queue as queue_module
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+
+from config import IMPORT_WORKERS
+from utils.import_parser import ImportReadError
+from utils.import_reader import pump_chunks
+
+logger = logging.getLogger(__name__)
+
+# Скільки прочитаних пачок може чекати на розбір; обмежує пам'ять між процесами
+IMPORT_QUEUE_CHUNKS = 4
+
+# spawn, а не fork: процес бота має потоки, цикл подій і відкриті з'єднання з БД
+_mp_context = multiprocessing.get_context("spawn")
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_import_executor() -> ProcessPoolExecutor:
+    """Повертає спільний пул процесів для розбору пачок імпорту, створюючи його за потреби."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMPORT_WORKERS, mp_context=_mp_context)
+        logger.info("Створено пул розбору імпорту на %s процесів.", IMPORT_WORKERS)
+    return _executor
+
+
+def shutdown_import_executor() -> None:
+    """Зупиняє пул розбору імпорту (під час завершення роботи бота)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def iter_chunks_in_subprocess(
+    chunk_reader: Callable[[str], Iterator[pd.DataFrame]], file_path: str
+) -> Iterator[pd.DataFrame]:
+    """
+    Читає файл імпорту в окремому процесі й віддає його пачки через чергу.
+
+    Розбір xlsx не займає процесор процесу бота, а обмежена черга тримає в пам'яті
+    лише кілька пачок. Якщо споживач зупинився раніше, читання переривається.
+    Якщо процес читання загинув, не поклавши завершального None (OOM, segfault),
+    піднімається `ImportReadError` з його кодом завершення.
+    """
+    chunks = _mp_context.Queue(maxsize=IMPORT_QUEUE_CHUNKS)
+    stop_event = _mp_context.Event()
+    process = _mp_context.Process(
+        target=pump_chunks, args=(chunk_reader, file_path, chunks, stop_event), daemon=True
+    )
+    process.start()
+    finished = False
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=1)
+            except queue_module.Empty:
+                if process.is_alive():
+                    continue
+                # Процес міг коректно завершитись щойно після таймауту — дочитуємо хвіст
+                try:
+                    item = chunks.get(timeout=1)
+                except queue_module.Empty:
+                    finished = True
+                    raise ImportReadError(
+                        f"процес читання файлу аварійно завершився (код {process.exitcode})"
+                    ) from None
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        finished = True
+    finally:
+        if not finished:
+            stop_event.set()
+            # Вичитуємо чергу, щоб процес читання не завис на put() і завершився
+            while process.is_alive():
+                try:
+                    if chunks.get(timeout=1) is None:
+                        break
+                except queue_module.Empty:
+                    continue
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
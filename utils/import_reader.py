@@ -0,0 +1,185 @@
+# epicservice/utils/import_reader.py
+
+import csv
+import gzip
+import hashlib
+import logging
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.import_parser import IMPORT_COLUMN_MAPPING, ImportReadError
+
+logger = logging.getLogger(__name__)
+
+# Кількість рядків у одній пачці імпорту: обмежує пікове споживання пам'яті
+IMPORT_CHUNK_SIZE = 5000
+# Скільки байтів з початку CSV читається для визначення кодування та роздільника
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_ENCODINGS = ("utf-8-sig", "cp1251")
+CSV_DELIMITERS = ";,\t|"
+
+
+def _cell_to_str(value) -> Optional[str]:
+    """Перетворює значення клітинки на рядок так само, як це бачив би pandas."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _header_positions(header: tuple) -> dict[str, int]:
+    """Знаходить позиції потрібних колонок (в/г/н/к/м/с/ц) у рядку заголовків."""
+    positions = {}
+    for index, name in enumerate(header):
+        key = str(name).lower()
+        if name is not None and key in IMPORT_COLUMN_MAPPING:
+            positions.setdefault(key, index)
+    return positions
+
+
+def read_xlsx_header(file_path: str) -> list[str]:
+    """Повертає назви колонок першого рядка книги, не читаючи решту файлу."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        return [str(name) for name in header if name is not None]
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_chunks(file_path: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Потоково читає книгу в режимі read-only і віддає пачки по `chunk_size` рядків.
+
+    Читаються лише колонки імпорту, усі значення — рядками. Індекс пачки — порядковий
+    номер рядка даних у файлі (0 відповідає другому рядку аркуша), тож він наскрізний
+    для всіх пачок і зберігає порядок рядків.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = _header_positions(header)
+        columns = list(positions)
+
+        batch, first_row_number = [], 0
+        for row_number, row in enumerate(rows):
+            batch.append([_cell_to_str(row[i]) if i < len(row) else None for i in positions.values()])
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, index=range(first_row_number, row_number + 1), dtype=object)
+                batch, first_row_number = [], row_number + 1
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=range(first_row_number, first_row_number + len(batch)), dtype=object)
+    finally:
+        workbook.close()
+
+
+def file_sha256(file_path: str) -> str:
+    """Рахує SHA-256 файлу, читаючи його блоками."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _open_csv_binary(file_path: str):
+    """Відкриває CSV для читання байтів, розпаковуючи `.gz` на льоту."""
+    return gzip.open(file_path, "rb") if file_path.endswith(".gz") else open(file_path, "rb")
+
+
+def detect_csv_format(file_path: str) -> tuple[str, str]:
+    """
+    Визначає кодування (utf-8 або cp1251) та роздільник CSV за його початком.
+
+    ERP вивантажує файли то в UTF-8 (часто з BOM), то в Windows-1251, тож
+    UTF-8 пробуємо першим: випадковий текст у cp1251 майже ніколи не є валідним UTF-8.
+    """
+    with _open_csv_binary(file_path) as f:
+        sample_bytes = f.read(CSV_SNIFF_BYTES)
+
+    for encoding in CSV_ENCODINGS:
+        try:
+            sample = sample_bytes.decode(encoding)
+            break
+        except UnicodeDecodeError as e:
+            # Зразок міг обірватися посеред багатобайтового символу UTF-8
+            if encoding.startswith("utf-8") and len(sample_bytes) == CSV_SNIFF_BYTES and e.start >= len(sample_bytes) - 3:
+                sample = sample_bytes[:e.start].decode(encoding)
+                break
+    else:
+        raise ValueError("не вдалося визначити кодування CSV (очікується UTF-8 або Windows-1251)")
+
+    try:
+        delimiter = csv.Sniffer().sniff(sample.split("\n", 1)[0], delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = ";"
+    return encoding, delimiter
+
+
+def read_csv_header(file_path: str) -> list[str]:
+    """Повертає назви колонок CSV (`.csv` або `.csv.gz`)."""
+    encoding, delimiter = detect_csv_format(file_path)
+    header = pd.read_csv(file_path, sep=delimiter, encoding=encoding, nrows=0, compression="infer")
+    return [str(name).strip() for name in header.columns]
+
+
+def iter_csv_chunks(file_path: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Потоково читає CSV пачками по `chunk_size` рядків у ту саму модель, що й `iter_xlsx_chunks`:
+    лише колонки імпорту, значення — рядками або None, наскрізний індекс рядків даних.
+    """
+    encoding, delimiter = detect_csv_format(file_path)
+    reader = pd.read_csv(
+        file_path, sep=delimiter, encoding=encoding, dtype=str, chunksize=chunk_size,
+        compression="infer", keep_default_na=False, na_values=[""], skipinitialspace=True,
+    )
+    first_row_number = 0
+    with reader:
+        for chunk in reader:
+            positions = _header_positions(tuple(str(name).strip() for name in chunk.columns))
+            chunk = chunk.iloc[:, list(positions.values())]
+            chunk.columns = list(positions)
+            chunk.index = range(first_row_number, first_row_number + len(chunk))
+            first_row_number += len(chunk)
+            yield chunk.astype(object).where(chunk.notna(), None)
+
+
+# Читачі за розширенням файлу: (назви колонок, пачки рядків).
+# Старий двійковий `.xls` openpyxl не читає, тому такі файли відхиляються одразу
+IMPORT_READERS = {
+    ".xlsx": (read_xlsx_header, iter_xlsx_chunks),
+    ".csv": (read_csv_header, iter_csv_chunks),
+    ".csv.gz": (read_csv_header, iter_csv_chunks),
+}
+
+
+def get_import_extension(file_name: str) -> Optional[str]:
+    """Повертає підтримуване розширення файлу імпорту або None."""
+    file_name = file_name.lower()
+    return next((ext for ext in sorted(IMPORT_READERS, key=len, reverse=True) if file_name.endswith(ext)), None)
+
+
+def pump_chunks(chunk_reader: Callable[[str], Iterator[pd.DataFrame]], file_path: str, queue, stop_event) -> None:
+    """
+    Точка входу окремого процесу читання: кладе пачки `chunk_reader(file_path)` у чергу.
+
+    Наприкінці завжди кладе None; помилку читання передає в чергу як `ImportReadError`
+    з початковим повідомленням.
+    Перериває читання, щойно споживач виставив `stop_event`.
+    """
+    try:
+        for chunk in chunk_reader(file_path):
+            if stop_event.is_set():
+                break
+            queue.put(chunk)
+    except Exception as e:
+        logger.error("Помилка читання файлу імпорту %s: %s", file_path, e, exc_info=True)
+        queue.put(ImportReadError(f"{type(e).__name__}: {e}"))
+    finally:
+        queue.put(None)
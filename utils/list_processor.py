@@ -1,5 +1,6 @@
 # epicservice/utils/list_processor.py
 
+import asyncio
 import logging
 import os
 from datetime import datetime
@@ -11,7 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config import ARCHIVES_PATH
 from database.orm import (orm_add_saved_list, orm_clear_temp_list,
                           orm_get_product_by_id, orm_get_temp_list,
-                          orm_update_reserved_quantity)
+                          orm_lock_products, orm_update_reserved_quantity)
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +52,8 @@ async def _save_list_to_excel(
         df_final = pd.concat([df, summary_df], ignore_index=True)
         # --- КІНЕЦЬ НОВОГО БЛОКУ ---
 
-        df_final.to_excel(file_path, index=False, header=['Артикул', 'Кількість'])
+        # Запис xlsx — синхронна робота, виносимо її з циклу подій
+        await asyncio.to_thread(df_final.to_excel, file_path, index=False, header=['Артикул', 'Кількість'])
         
         logger.info("Файл успішно збережено: %s", file_path)
         return file_path
@@ -81,6 +83,8 @@ async def process_and_save_list(
     total_surplus_sum = 0.0
     # --- КІНЕЦЬ НОВОГО БЛОКУ ---
 
+    # Спершу блокуємо всі товари списку в порядку id: так паралельні збереження не дають deadlock
+    await orm_lock_products(session, (item.product_id for item in temp_list))
     for item in temp_list:
         product = await orm_get_product_by_id(session, item.product_id, for_update=True)
         if not product:
@@ -0,0 +1,34 @@
+# epicservice/utils/report_cache.py
+
+import logging
+from typing import Optional
+
+from database.orm import orm_get_cached_report, orm_store_cached_report
+
+logger = logging.getLogger(__name__)
+
+# Тип звіту -> (версії даних, file_id документа в Telegram).
+# Локальна копія таблиці report_cache, спільної для всіх процесів бота.
+_report_cache: dict[str, tuple[tuple, str]] = {}
+
+
+async def get_cached_report(report_kind: str, versions: tuple) -> Optional[str]:
+    """Повертає file_id раніше надісланого звіту, якщо дані з того часу не змінювались."""
+    cached = _report_cache.get(report_kind)
+    if cached and cached[0] == versions:
+        file_id = cached[1]
+    elif file_id := await orm_get_cached_report(report_kind, versions):
+        _report_cache[report_kind] = (versions, file_id)
+    else:
+        return None
+    logger.info("Звіт '%s' віддано з кешу (версії %s).", report_kind, versions)
+    return file_id
+
+
+async def store_cached_report(report_kind: str, versions: tuple, file_id: str):
+    """Запам'ятовує file_id згенерованого звіту для вказаних версій даних."""
+    _report_cache[report_kind] = (versions, file_id)
+    try:
+        await orm_store_cached_report(report_kind, versions, file_id)
+    except Exception as e:
+        logger.warning("Не вдалося зберегти звіт '%s' у спільний кеш: %s", report_kind, e)
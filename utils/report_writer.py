@@ -0,0 +1,82 @@
+# epicservice/utils/report_writer.py
+
+import asyncio
+import csv
+import gzip
+import logging
+from typing import AsyncIterator, Iterable, Sequence
+
+from openpyxl import Workbook
+
+logger = logging.getLogger(__name__)
+
+# Доступні формати вивантаження звітів (значення є і розширенням файлу)
+REPORT_FORMATS = ("xlsx", "csv", "csv.gz")
+# Excel з українською локаллю очікує крапку з комою як роздільник
+CSV_DELIMITER = ";"
+
+
+def _append_rows(sheet, rows: Iterable[Sequence]):
+    """Дописує пачку рядків у лист write-only книги."""
+    for row in rows:
+        sheet.append(list(row))
+
+
+async def write_xlsx_report(
+    file_path: str,
+    headers: Sequence[str],
+    row_batches: AsyncIterator[Sequence[Sequence]]
+) -> str:
+    """
+    Потоково записує звіт у .xlsx: рядки надходять пачками і одразу
+    скидаються у write-only книгу, тож у пам'яті тримається лише поточна пачка.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Sheet1")
+    sheet.append(list(headers))
+
+    async for batch in row_batches:
+        await asyncio.to_thread(_append_rows, sheet, batch)
+
+    await asyncio.to_thread(workbook.save, file_path)
+    return file_path
+
+
+async def write_csv_report(
+    file_path: str,
+    headers: Sequence[str],
+    row_batches: AsyncIterator[Sequence[Sequence]],
+    compress: bool = False
+) -> str:
+    """
+    Потоково записує звіт у CSV (UTF-8 з BOM, щоб Excel коректно показав кирилицю),
+    за потреби одразу стискаючи його gzip.
+    """
+    opener = gzip.open if compress else open
+    csv_file = await asyncio.to_thread(opener, file_path, "wt", encoding="utf-8-sig", newline="")
+    try:
+        writer = csv.writer(csv_file, delimiter=CSV_DELIMITER)
+        writer.writerow(headers)
+        async for batch in row_batches:
+            await asyncio.to_thread(writer.writerows, batch)
+    finally:
+        await asyncio.to_thread(csv_file.close)
+    return file_path
+
+
+async def write_report(
+    file_path_base: str,
+    report_format: str,
+    headers: Sequence[str],
+    row_batches: AsyncIterator[Sequence[Sequence]]
+) -> str:
+    """
+    Записує звіт у вказаному форматі; до `file_path_base` додається розширення.
+    Усі формати споживають один і той самий потік пачок рядків.
+    """
+    file_path = f"{file_path_base}.{report_format}"
+    if report_format == "xlsx":
+        return await write_xlsx_report(file_path, headers, row_batches)
+    if report_format in ("csv", "csv.gz"):
+        return await write_csv_report(file_path, headers, row_batches, compress=report_format == "csv.gz")
+    raise ValueError(f"Невідомий формат звіту: {report_format}")
@@ -0,0 +1,203 @@
+# epicservice/utils/update_workers.py
+
+import asyncio
+import logging
+import multiprocessing as mp
+import signal
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiohttp import web
+
+from config import (BOT_MODE, BOT_WORKERS, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    WEBHOOK_URL)
+from utils.webhook_server import start_web_app, wait_for_stop_signal
+
+logger = logging.getLogger(__name__)
+
+# Як і для пулу імпорту: spawn не успадковує цикл подій і з'єднання батьківського процесу
+_mp_context = mp.get_context("spawn")
+
+POLLING_TIMEOUT = 30
+# Як часто головний процес перевіряє, чи живі обробники
+SUPERVISE_INTERVAL = 5.0
+WORKER_STOP_TIMEOUT = 30.0
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def partition_key(raw_update: dict[str, Any]) -> int:
+    """
+    Повертає ID користувача (або чату), за яким оновлення закріплюється за процесом.
+
+    Тим самим ключем aiogram адресує стан FSM, тож оновлення користувача обробляє
+    лише один процес. Стан чужих користувачів може змінювати й інший процес
+    (примусове збереження адміністратором); такі зміни доходять до процесу-власника
+    через NOTIFY-інвалідацію кешу в `PostgresStorage`.
+    """
+    for name, event in raw_update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user"):
+            if isinstance(event.get(field), dict):
+                return event[field]["id"]
+        if isinstance(event.get("chat"), dict):
+            return event["chat"]["id"]
+    return 0
+
+
+def worker_main(index: int, queue) -> None:
+    """Точка входу процесу-обробника: власні бот, сховище та диспетчер, оновлення — з черги."""
+    # Зупинкою керує головний процес (через None у черзі), тож сигнали тут ігноруються
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_loop(index, queue))
+
+
+async def _process_in_order(dp, bot: Bot, raw_update: dict, previous: Optional[asyncio.Task]):
+    if previous is not None:
+        await asyncio.wait([previous])
+    try:
+        await dp.feed_raw_update(bot, raw_update)
+    except Exception as e:
+        logger.error("Помилка обробки оновлення %s: %s", raw_update.get("update_id"), e, exc_info=True)
+
+
+async def _worker_loop(index: int, queue):
+    # Імпорт тут, бо bot.py сам імпортує цей модуль
+    from bot import build_dispatcher, create_bot, create_storage, setup_logging
+    from utils.import_pool import shutdown_import_executor
+
+    setup_logging()
+    bot, storage = create_bot(), create_storage()
+    dp = build_dispatcher(storage)
+    # Остання задача кожного користувача: наступне оновлення чекає на її завершення
+    tails: dict[int, asyncio.Task] = {}
+
+    def forget(key: int, task: asyncio.Task):
+        if tails.get(key) is task:
+            del tails[key]
+
+    logger.info("Процес-обробник %s запущено.", index)
+    try:
+        while (item := await asyncio.to_thread(queue.get)) is not None:
+            key, raw_update = item
+            task = asyncio.create_task(_process_in_order(dp, bot, raw_update, tails.get(key)))
+            tails[key] = task
+            task.add_done_callback(lambda t, k=key: forget(k, t))
+        if tails:
+            await asyncio.wait(list(tails.values()))
+    finally:
+        await storage.close()
+        await bot.session.close()
+        shutdown_import_executor()
+        logger.info("Процес-обробник %s зупинено.", index)
+
+
+class UpdateRouter:
+    """Запускає BOT_WORKERS процесів-обробників і розподіляє між ними оновлення за `partition_key`."""
+
+    def __init__(self, workers: int = BOT_WORKERS):
+        self.queues = [_mp_context.Queue() for _ in range(workers)]
+        self.processes: list[Optional[mp.Process]] = [None] * workers
+
+    def _start(self, index: int):
+        process = _mp_context.Process(target=worker_main, args=(index, self.queues[index]), daemon=True)
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(len(self.queues)):
+            self._start(index)
+
+    def dispatch(self, raw_update: dict[str, Any]):
+        key = partition_key(raw_update)
+        self.queues[key % len(self.queues)].put((key, raw_update))
+
+    async def supervise(self):
+        """Перезапускає обробники, що аварійно завершились; їхня черга лишається тією самою."""
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logger.error("Процес-обробник %s завершився (код %s), перезапускаю.", index, process.exitcode)
+                    self._start(index)
+
+    async def stop(self):
+        """Просить обробники дообробити свої черги й дочікується їх, зависші — зупиняє примусово."""
+        for queue in self.queues:
+            queue.put(None)
+        for index, process in enumerate(self.processes):
+            await asyncio.to_thread(process.join, WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning("Процес-обробник %s не зупинився вчасно, завершую примусово.", index)
+                process.terminate()
+
+
+async def _poll_updates(bot: Bot, router: UpdateRouter, allowed_updates: list[str], stop_event: asyncio.Event):
+    await bot.delete_webhook(drop_pending_updates=True)
+    offset = None
+    stop_waiter = asyncio.create_task(stop_event.wait())
+    try:
+        while True:
+            request = asyncio.create_task(bot.get_updates(
+                offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=allowed_updates
+            ))
+            await asyncio.wait([request, stop_waiter], return_when=asyncio.FIRST_COMPLETED)
+            if stop_waiter.done():
+                request.cancel()
+                return
+            try:
+                updates = request.result()
+            except TelegramAPIError as e:
+                logger.error("Помилка отримання оновлень: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                router.dispatch(update.model_dump(mode="json", by_alias=True, exclude_unset=True))
+                offset = update.update_id + 1
+    finally:
+        stop_waiter.cancel()
+
+
+async def _serve_webhook(bot: Bot, router: UpdateRouter, allowed_updates: list[str], stop_event: asyncio.Event):
+    async def receive_update(request: web.Request) -> web.Response:
+        if request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        router.dispatch(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, receive_update)
+    runner = await start_web_app(app)
+    try:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=True,
+        )
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_update_workers(bot: Bot, allowed_updates: list[str]):
+    """
+    Головний процес багатопроцесного режиму: лише отримує оновлення (polling або webhook)
+    і передає їх обробникам. Оновлення одного користувача завжди йдуть в один процес
+    і обробляються там строго по черзі; різні користувачі обробляються паралельно.
+    """
+    router = UpdateRouter()
+    router.start()
+    supervisor = asyncio.create_task(router.supervise())
+    stop_event = wait_for_stop_signal()
+    try:
+        if BOT_MODE == "webhook":
+            await _serve_webhook(bot, router, allowed_updates, stop_event)
+        else:
+            await _poll_updates(bot, router, allowed_updates, stop_event)
+    finally:
+        supervisor.cancel()
+        logger.info("Зупинка процесів-обробників...")
+        await router.stop()
@@ -0,0 +1,76 @@
+# epicservice/utils/webhook_server.py
+
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from sqlalchemy import text
+
+from config import (WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET,
+                    WEBHOOK_URL)
+from database.engine import async_session
+
+logger = logging.getLogger(__name__)
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """Перевірка стану для reverse proxy та моніторингу: сервер живий і БД відповідає."""
+    try:
+        async with async_session() as session:
+            await session.execute(text('SELECT 1'))
+    except Exception as e:
+        logger.warning("Healthcheck: база даних недоступна: %s", e)
+        return web.json_response({"status": "db_unavailable"}, status=503)
+    return web.json_response({"status": "ok"})
+
+
+def wait_for_stop_signal() -> asyncio.Event:
+    """Повертає подію, що встановлюється при SIGINT/SIGTERM (для коректної зупинки)."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:  # Windows
+            pass
+    return stop_event
+
+
+async def start_web_app(app: web.Application) -> web.AppRunner:
+    """Запускає aiohttp-застосунок на WEBHOOK_HOST:WEBHOOK_PORT і повертає його runner."""
+    app.router.add_get("/healthz", healthz)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT).start()
+    logger.info("Webhook-сервер слухає %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+    return runner
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """
+    Обслуговує диспетчер через aiohttp-сервер замість long polling.
+
+    Запити без правильного секретного заголовка відхиляються. Як і в режимі polling,
+    оновлення, що накопичились за час простою, при старті відкидаються.
+    """
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    stop_event = wait_for_stop_signal()
+    runner = await start_web_app(app)
+    try:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True,
+        )
+        await stop_event.wait()
+    finally:
+        logger.info("Зупинка webhook-сервера...")
+        # Дочікується обробки вже прийнятих запитів і викликає shutdown-хуки диспетчера
+        await runner.cleanup()